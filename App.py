@@ -1,4 +1,5 @@
-import sqlite3
+import os
+
 import dash
 from dash import dcc, html, Input, Output, State
 import dash_bootstrap_components as dbc
@@ -7,9 +8,12 @@ import plotly.express as px
 from datetime import datetime, timedelta
 import pandas as pd
 
-from database import HabitDatabase
+from analytics import AnalyticsSnapshot
+from database import HabitDatabase, ratio
+from figure_cache import FigureCache
 from burnout_predictor import BurnoutPredictor
-from sentiment_analyzer import SentimentAnalyzer
+from sentiment_analyzer import SentimentAnalyzer, cache_path_for
+from jobs import JobQueue
 
 # Initialize
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.COSMO])
@@ -39,7 +43,13 @@ app.index_string = '''
 </html> 
 '''
 db = HabitDatabase()
+SentimentAnalyzer.enable_disk_cache(cache_path_for(db.db_name))
 predictor = BurnoutPredictor(db)
+# Built figures per data revision; set HABIT_FIGURE_CACHE to a file to share them between workers
+figures = FigureCache(db, path=os.environ.get('HABIT_FIGURE_CACHE'))
+# Scores journal entries in the background; resumes jobs left by a previous run
+jobs = JobQueue(db)
+jobs.start()
 
 # App layout
 app.layout = dbc.Container([
@@ -68,7 +78,7 @@ def render_achievements():
     
     points = game.calculate_points()
     level, icon, threshold = game.get_level(points)
-    achievements = game.check_achievements()
+    achievements = game.unlocked_achievements()
     quote = game.get_motivational_quote()
     
     return dbc.Container([
@@ -91,23 +101,46 @@ def render_achievements():
                 html.Div([
                     dbc.Card([
                         dbc.CardBody([
-                            html.H5(f"{icon} {title}"),
-                            html.P(description)
+                            html.H5(f"{rule.icon} {rule.title}"),
+                            html.P(rule.description),
+                            html.Small(f"Unlocked {unlocked_at[:10]}", className="text-muted")
                         ])
                     ], className="mb-2")
-                    for icon, title, description in achievements
+                    for rule, unlocked_at in achievements
                 ])
             ])
         ])
     ])
 
 
+# Queries run by the latest render of each tab
+render_queries = {}
+
 # Callback to render different tab content
 @app.callback(
     Output("tab-content", "children"),
     Input("tabs", "active_tab")
 )
 def render_tab_content(active_tab):
+    # SQL statements per render, by tab (see HabitDatabase.count_queries)
+    with db.count_queries() as queries:
+        content = _render_tab(active_tab)
+    render_queries[active_tab] = sum(queries.values())
+    app.logger.debug("%s render: %d queries %s", active_tab, render_queries[active_tab],
+                     dict(queries))
+    return content
+
+@app.server.route("/stats")
+def cache_stats():
+    # Hit/miss counters of the server-side caches and queries per tab render
+    return {
+        'figures': figures.stats(),
+        'read_cache': db.cache_stats(),
+        'sentiment': SentimentAnalyzer.cache_stats(),
+        'render_queries': render_queries,
+    }
+
+def _render_tab(active_tab):
     if active_tab == "dashboard":
         return render_dashboard()
     elif active_tab == "add-habit":
@@ -122,10 +155,12 @@ def render_tab_content(active_tab):
 
 # Dashboard layout
 def render_dashboard():
-    logs = db.get_habit_logs(days=30)
-    burnout_score, recommendation = predictor.calculate_burnout_score(days=14)
+    # One rollup read shared by every card and chart below
+    snapshot = AnalyticsSnapshot(db)
+    rollup = snapshot.get_daily_rollup(days=30)
+    burnout_score, recommendation = predictor.calculate_burnout_score(days=14, snapshot=snapshot)
     
-    if logs.empty:
+    if rollup.empty:
         return dbc.Container([
             dbc.Card([
                 dbc.CardBody([
@@ -140,9 +175,9 @@ def render_dashboard():
         ])
     
     # Stats cards at top
-    total_completions = len(logs)
-    avg_mood = round(logs['mood_score'].mean(), 1) if not logs.empty else 0
-    unique_habits = logs['name'].nunique()
+    total_completions = int(rollup['completions'].sum())
+    avg_mood = round(ratio(rollup['mood_sum'].sum(), rollup['mood_count'].sum()), 1)
+    unique_habits = rollup['name'].nunique()
     
     return dbc.Container([
         # Summary Stats Row
@@ -203,7 +238,9 @@ def render_dashboard():
                             "Habit Completions"
                         ], className="card-title"),
                         dcc.Graph(
-                            figure=create_completion_chart(logs),
+                            figure=figures.figure('completions', 30,
+                                                  lambda: create_completion_chart(rollup),
+                                                  snapshot.generation),
                             config={'displayModeBar': False}
                         )
                     ])
@@ -218,7 +255,8 @@ def render_dashboard():
                             "Mood & Energy Trends"
                         ], className="card-title"),
                         dcc.Graph(
-                            figure=create_trend_chart(logs),
+                            figure=figures.figure('trend', 30, lambda: create_trend_chart(rollup),
+                                                  snapshot.generation),
                             config={'displayModeBar': False}
                         )
                     ])
@@ -226,6 +264,21 @@ def render_dashboard():
             ], width=12, lg=6, className="mb-4"),
         ]),
         
+        # Weekly Goals Row
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H4([
+                            html.Span("🎯 ", className="emoji-icon"),
+                            "Weekly Goals"
+                        ], className="card-title"),
+                        create_goal_progress(snapshot.rolling_completion_rates(windows=(7, 30)))
+                    ])
+                ], className="shadow")
+            ], width=12, className="mb-4")
+        ]),
+        
         # Burnout Card
         dbc.Row([
             dbc.Col([
@@ -238,7 +291,9 @@ def render_dashboard():
                         dbc.Row([
                             dbc.Col([
                                 dcc.Graph(
-                                    figure=create_burnout_gauge(burnout_score),
+                                    figure=figures.figure('burnout-gauge', 14,
+                                                          lambda: create_burnout_gauge(burnout_score),
+                                                          snapshot.generation),
                                     config={'displayModeBar': False}
                                 )
                             ], width=12, md=6),
@@ -249,19 +304,58 @@ def render_dashboard():
                                         recommendation,
                                         color="success" if burnout_score < 40 else "warning" if burnout_score < 70 else "danger",
                                         className="mt-3"
-                                    )
+                                    ),
+                                    create_model_risk(predictor.predict_burnout_risk(snapshot=snapshot))
                                 ])
                             ], width=12, md=6)
                         ])
                     ])
                 ], className="shadow")
+            ], width=12, className="mb-4")
+        ]),
+        
+        # Burnout History Row
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H4([
+                            html.Span("📉 ", className="emoji-icon"),
+                            "Burnout Risk Over the Past Year"
+                        ], className="card-title"),
+                        dcc.Graph(
+                            figure=figures.figure('burnout-history', 365, lambda: create_burnout_history_chart(
+                                predictor.burnout_series(snapshot=snapshot)), snapshot.generation),
+                            config={'displayModeBar': False}
+                        )
+                    ])
+                ], className="shadow")
             ], width=12)
         ])
     ])
 
 # Helper functions for better charts
-def create_completion_chart(logs):
-    habit_counts = logs.groupby('name').size().reset_index(name='count')
+def create_goal_progress(rates):
+    rows = []
+    for _, habit in rates.iterrows():
+        rate = habit['rate_7d']
+        rows.append(html.Div([
+            html.Div([
+                html.Strong(habit['name']),
+                html.Span(f" {habit['actual_7d']} this week · {habit['rate_30d']:.0f}% over 30 days",
+                          className="text-muted")
+            ]),
+            dbc.Progress(
+                value=min(rate, 100),
+                label=f"{rate:.0f}%",
+                color="success" if rate >= 100 else "info" if rate >= 50 else "warning",
+                className="mb-2"
+            )
+        ]))
+    return html.Div(rows)
+
+def create_completion_chart(rollup):
+    habit_counts = rollup.groupby('name')['completions'].sum().reset_index(name='count')
     fig = px.bar(
         habit_counts,
         x='name',
@@ -279,9 +373,15 @@ def create_completion_chart(logs):
     )
     return fig
 
-def create_trend_chart(logs):
-    logs['completed_date'] = pd.to_datetime(logs['completed_date'])
-    daily_avg = logs.groupby('completed_date')[['mood_score', 'energy_level']].mean().reset_index()
+def create_trend_chart(rollup):
+    daily = rollup.groupby('completed_date')[
+        ['mood_sum', 'mood_count', 'energy_sum', 'energy_count']
+    ].sum()
+    daily_avg = pd.DataFrame({
+        'completed_date': pd.to_datetime(daily.index),
+        'mood_score': daily['mood_sum'] / daily['mood_count'],
+        'energy_level': daily['energy_sum'] / daily['energy_count'],
+    })
     
     fig = go.Figure()
     fig.add_trace(go.Scatter(
@@ -425,6 +525,40 @@ def create_burnout_gauge(score):
         ])
     ])
 
+def create_model_risk(risk):
+    # Only shown once a model has been trained with `manage.py train-burnout`
+    if risk is None:
+        return html.Div()
+    horizon = predictor.model.horizon
+    return html.P(
+        f"🤖 Learned model: {risk:.0f}% chance of elevated burnout risk within {horizon} days",
+        className="text-muted"
+    )
+
+def create_burnout_history_chart(series):
+    fig = go.Figure()
+    # Same bands as the gauge
+    for low, high, color in ((0, 40, "rgba(56, 239, 125, 0.15)"),
+                             (40, 70, "rgba(255, 193, 7, 0.15)"),
+                             (70, 100, "rgba(220, 53, 69, 0.15)")):
+        fig.add_hrect(y0=low, y1=high, fillcolor=color, line_width=0, layer="below")
+    fig.add_trace(go.Scatter(
+        x=series['date'],
+        y=series['score'],
+        name='Burnout risk',
+        line=dict(color='#f5576c', width=2)
+    ))
+    fig.update_layout(
+        height=300,
+        margin=dict(l=20, r=20, t=20, b=20),
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        xaxis_title='',
+        yaxis=dict(title='Risk (0-100)', range=[0, 100]),
+        hovermode='x unified'
+    )
+    return fig
+
 # Add Habit layout
 def render_add_habit():
     return dbc.Container([
@@ -578,7 +712,10 @@ def render_journal():
                 ]),
                 
                 dbc.Button("Save Entry", id="save-journal-btn", color="primary", className="mt-4"),
-                html.Div(id="journal-output", className="mt-3")
+                html.Div(id="journal-output", className="mt-3"),
+                # Entry whose sentiment is still being scored, polled until it is ready
+                dcc.Store(id="journal-pending"),
+                dcc.Interval(id="journal-poll", interval=1000, disabled=True)
             ])
         ])
     ])
@@ -610,6 +747,8 @@ def log_activity(n_clicks, habit_id, date, mood, energy, notes):
 # Callback to save journal
 @app.callback(
     Output("journal-output", "children"),
+    Output("journal-pending", "data"),
+    Output("journal-poll", "disabled"),
     Input("save-journal-btn", "n_clicks"),
     State("journal-date", "value"),
     State("journal-content", "value"),
@@ -617,23 +756,33 @@ def log_activity(n_clicks, habit_id, date, mood, energy, notes):
 )
 def save_journal(n_clicks, date, content):
     if not content:
-        return dbc.Alert("Please write something in your journal!", color="danger")
+        return dbc.Alert("Please write something in your journal!", color="danger"), None, True
     
-    # Analyze sentiment
-    sentiment = SentimentAnalyzer.analyze_text(content)
+    # Save now; sentiment is scored by the job queue and picked up by poll_journal
+    entry_id = db.add_journal_entry(date, content)
+    jobs.notify()
     
-    # Save to database
-    conn = sqlite3.connect(db.db_name)
-    cursor = conn.cursor()
-    cursor.execute(
-        'INSERT INTO journal_entries (entry_date, content, sentiment_score) VALUES (?, ?, ?)',
-        (date, content, sentiment)
-    )
-    conn.commit()
-    conn.close()
+    return dbc.Alert("✅ Journal saved! Analyzing sentiment...", color="success"), entry_id, False
+
+@app.callback(
+    Output("journal-output", "children", allow_duplicate=True),
+    Output("journal-poll", "disabled", allow_duplicate=True),
+    Input("journal-poll", "n_intervals"),
+    State("journal-pending", "data"),
+    prevent_initial_call=True
+)
+def poll_journal(n, entry_id):
+    entry = db.get_journal_entry(entry_id) if entry_id else None
+    if entry is None:
+        return dash.no_update, True
+    if entry['sentiment_status'] in ('pending', 'running'):
+        return dash.no_update, False
+    if entry['sentiment_score'] is None:
+        # The job gave up (or none was queued); stop polling
+        return dbc.Alert("✅ Journal saved! Sentiment unavailable", color="warning"), True
     
-    sentiment_text = SentimentAnalyzer.get_sentiment_category(sentiment)
-    return dbc.Alert(f"✅ Journal saved! Sentiment: {sentiment_text}", color="success")
+    sentiment_text = SentimentAnalyzer.get_sentiment_category(entry['sentiment_score'])
+    return dbc.Alert(f"✅ Journal saved! Sentiment: {sentiment_text}", color="success"), True
 
 # Run the app
 @app.callback(
@@ -646,14 +795,15 @@ def update_streaks(n):
     if habits.empty:
         return html.P("No habits yet!")
     
+    streaks = db.get_all_streaks()
     streak_items = []
-    for _, habit in habits.iterrows():
-        streak = db.get_current_streak(habit['id'])
+    for habit_id, name in zip(habits['id'], habits['name']):
+        streak = streaks[habit_id].current
         
         if streak > 0:
             streak_items.append(
                 html.Div([
-                    html.Strong(f"{habit['name']}: "),
+                    html.Strong(f"{name}: "),
                     html.Span(f"🔥 {streak} days", 
                              style={'color': 'orange' if streak >= 7 else 'gray'})
                 ], className="mb-2")
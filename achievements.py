@@ -0,0 +1,111 @@
+"""Declarative achievement rules, evaluated incrementally.
+
+Achievements are data: a metric, a comparator and a threshold. The metrics
+are running counters in the `achievement_metrics` table that
+HabitDatabase updates in the same transaction as each log, and a write
+re-evaluates only the still-locked rules whose inputs it changed. Unlocks
+are stored with a timestamp in `achievement_unlocks` and never revoked, so
+reading them never touches the log history.
+"""
+import operator
+from collections import namedtuple
+from datetime import datetime
+
+# avg_mood is undefined (so never unlocks anything) below this many rated logs
+MIN_MOOD_LOGS = 30
+
+Rule = namedtuple('Rule', ['key', 'icon', 'title', 'description', 'metric', 'comparator',
+                           'threshold'])
+
+# Declaration order is display order
+ACHIEVEMENTS = (
+    Rule('first_steps', '🎯', 'First Steps', 'Logged 10 activities', 'total_logs', '>=', 10),
+    Rule('committed', '⭐', 'Committed', 'Logged 50 activities', 'total_logs', '>=', 50),
+    Rule('century_club', '🏆', 'Century Club', 'Logged 100 activities', 'total_logs', '>=', 100),
+    Rule('year_warrior', '👑', 'Year Warrior', 'Logged 365 activities', 'total_logs', '>=', 365),
+    Rule('on_fire', '🔥', 'On Fire', '3 day streak', 'longest_streak', '>=', 3),
+    Rule('week_warrior', '💪', 'Week Warrior', '7 day streak', 'longest_streak', '>=', 7),
+    Rule('month_master', '💎', 'Month Master', '30 day streak', 'longest_streak', '>=', 30),
+    Rule('happy_soul', '😊', 'Happy Soul', f'Average mood 4.5+ over {MIN_MOOD_LOGS}+ rated logs',
+         'avg_mood', '>=', 4.5),
+)
+RULES = {rule.key: rule for rule in ACHIEVEMENTS}
+
+COMPARATORS = {
+    '>=': operator.ge,
+    '>': operator.gt,
+    '<=': operator.le,
+    '<': operator.lt,
+    '==': operator.eq,
+}
+
+# Metrics computed from stored counters: name -> (inputs, fn(values))
+DERIVED_METRICS = {
+    'avg_mood': (('mood_sum', 'mood_count'),
+                 lambda m: (m['mood_sum'] / m['mood_count']
+                            if m.get('mood_count', 0) >= MIN_MOOD_LOGS else None)),
+}
+
+ADD_SQL = '''
+    INSERT INTO achievement_metrics (name, value) VALUES (?, ?)
+    ON CONFLICT (name) DO UPDATE SET value = value + excluded.value
+'''
+# Only touches the row (and so only reports a change) when the value grows
+MAX_SQL = '''
+    INSERT INTO achievement_metrics (name, value) VALUES (?, ?)
+    ON CONFLICT (name) DO UPDATE SET value = excluded.value WHERE excluded.value > value
+'''
+
+
+def metric_inputs(metric):
+    """Stored counters a metric is computed from"""
+    return DERIVED_METRICS[metric][0] if metric in DERIVED_METRICS else (metric,)
+
+
+def metric_value(metric, values):
+    if metric in DERIVED_METRICS:
+        return DERIVED_METRICS[metric][1](values)
+    return values.get(metric)
+
+
+def record(cursor, added=None, maxima=None):
+    """Fold a write into the counters and unlock any rules it satisfies.
+
+    `added` maps counters to increments and `maxima` maps counters to
+    candidate maxima. Returns the keys of newly unlocked achievements.
+    """
+    changed = set()
+    for name, delta in (added or {}).items():
+        if delta:
+            cursor.execute(ADD_SQL, (name, delta))
+            changed.add(name)
+    for name, value in (maxima or {}).items():
+        if value is not None:
+            cursor.execute(MAX_SQL, (name, value))
+            if cursor.rowcount:
+                changed.add(name)
+    return evaluate(cursor, changed)
+
+
+def evaluate(cursor, changed=None, now=None):
+    """Check locked rules whose inputs are in `changed` (all rules when None)"""
+    rules = [rule for rule in ACHIEVEMENTS
+             if changed is None or changed.intersection(metric_inputs(rule.metric))]
+    if not rules:
+        return []
+    unlocked = {key for (key,) in cursor.execute('SELECT key FROM achievement_unlocks')}
+    rules = [rule for rule in rules if rule.key not in unlocked]
+    if not rules:
+        return []
+    values = dict(cursor.execute('SELECT name, value FROM achievement_metrics'))
+    now = now or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    newly = []
+    for rule in rules:
+        value = metric_value(rule.metric, values)
+        if value is not None and COMPARATORS[rule.comparator](value, rule.threshold):
+            cursor.execute(
+                'INSERT OR IGNORE INTO achievement_unlocks (key, unlocked_at, value) VALUES (?, ?, ?)',
+                (rule.key, now, value)
+            )
+            newly.append(rule.key)
+    return newly
@@ -0,0 +1,147 @@
+"""Per-render analytics snapshot.
+
+AnalyticsSnapshot runs one query for everything a dashboard render reads:
+the daily_totals rows of the past year and the per-habit daily rollup rows
+of the last month, held as flat NumPy arrays (habit id, day number and the
+completion, mood, energy and sentiment sums). It answers the same window
+reads as HabitDatabase (get_daily_rollup, get_daily_totals, window_totals,
+rolling_completion_rates, get_journal_totals), so BurnoutPredictor and the
+chart builders take either one. `generation` is the database generation
+the snapshot was read at, for keying anything built from it. Reads reaching before the snapshot fall
+through to the database.
+"""
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from database import HABITS_SQL, SNAPSHOT_SQL, SUM_COLUMNS, rolling_rates
+
+# The past-year burnout chart plus its 14-day scoring window
+SNAPSHOT_DAYS = 365 + 14
+# Per-habit rows are only needed for the 30-day charts and goals
+HABIT_DAYS = 30
+
+# Stored as REAL; every other sum column is an integer
+FLOAT_COLUMNS = {'sentiment_sum'}
+
+
+class AnalyticsSnapshot:
+    def __init__(self, database, days=SNAPSHOT_DAYS, habit_days=HABIT_DAYS):
+        self.db = database
+        # Windows are UTC-relative in SQL and local in the predictor; cover both
+        today = min(datetime.now(timezone.utc).date(), datetime.now().date())
+        self.origin = today - timedelta(days=int(days))
+        self.habit_origin = today - timedelta(days=int(habit_days))
+        # Sentiment in notes is scored when logged; older rows are scored once here
+        database.backfill_sentiment(days=int(days) + 1)
+        # After the backfill, which may write, and before the data, so anything
+        # keyed on it is never older than the data it was built from
+        self.generation = database.generation
+        conn = database.connection()
+        self.habits = pd.read_sql_query(HABITS_SQL, conn)
+        # Plain numeric rows; building a DataFrame here would cost more than the query
+        rows = np.array(conn.execute(SNAPSHOT_SQL, {
+            'origin': self.origin.isoformat(), 'habit_origin': self.habit_origin.isoformat()
+        }).fetchall(), dtype=float).reshape(-1, 2 + len(SUM_COLUMNS))
+        habit_id = rows[:, 0].astype(np.int64)
+        day = rows[:, 1].astype(np.int32)
+        columns = {column: rows[:, 2 + i] if column in FLOAT_COLUMNS
+                   else rows[:, 2 + i].astype(np.int64)
+                   for i, column in enumerate(SUM_COLUMNS)}
+        # Date strings per day number, taken (not rebuilt) by every reader
+        calendar = pd.date_range(self.origin, periods=int(day.max(initial=0)) + 1, freq='D')
+        dates = pd.Index(calendar.strftime('%Y-%m-%d')).array.take(day)
+
+        per_habit = habit_id > 0
+        self.habit_id = habit_id[per_habit]
+        self.day = day[per_habit]
+        self.dates = dates[per_habit]
+        self.values = {column: values[per_habit] for column, values in columns.items()}
+        # daily_totals rows, in date order
+        daily = np.flatnonzero(~per_habit)
+        daily = daily[np.argsort(day[daily], kind='stable')]
+        self.daily_day = day[daily]
+        self.daily_dates = dates.take(daily)
+        self.daily_values = {column: values[daily] for column, values in columns.items()}
+        self._journal = None
+
+    def _day(self, date):
+        """Day number of a date; negative before the snapshot"""
+        return (pd.Timestamp(str(date)[:10]).date() - self.origin).days
+
+    def _cutoff(self, days):
+        """Day number where an N-day window ending today (UTC) starts"""
+        return self._day(datetime.now(timezone.utc).date() - timedelta(days=int(days)))
+
+    def _has_habit_rows(self, cutoff):
+        return cutoff >= (self.habit_origin - self.origin).days
+
+    def get_daily_rollup(self, days=30):
+        """Same rows as HabitDatabase.get_daily_rollup(days)"""
+        cutoff = self._cutoff(days)
+        if not self._has_habit_rows(cutoff):
+            return self.db.get_daily_rollup(days)
+        row = pd.Index(self.habits['habit_id']).get_indexer(self.habit_id)
+        keep = (self.day >= cutoff) & (row >= 0)
+        return pd.DataFrame({
+            'completed_date': self.dates[keep],
+            'habit_id': self.habit_id[keep],
+            **{column: self.values[column][keep] for column in SUM_COLUMNS},
+            'name': self.habits['name'].array.take(row[keep]),
+            'category': self.habits['category'].array.take(row[keep]),
+        })
+
+    def get_daily_totals(self, start, end):
+        """Same rows as HabitDatabase.get_daily_totals(start, end)"""
+        first = self._day(start)
+        if first < 0:
+            return self.db.get_daily_totals(start, end)
+        keep = (self.daily_day >= first) & (self.daily_day <= self._day(end))
+        return pd.DataFrame({
+            'completed_date': self.daily_dates[keep],
+            **{column: self.daily_values[column][keep] for column in SUM_COLUMNS},
+        })
+
+    def window_totals(self, days, midpoint):
+        """Same dict as HabitDatabase.window_totals(days, midpoint)"""
+        cutoff = self._cutoff(days)
+        if cutoff < 0:
+            return self.db.window_totals(days, midpoint)
+        keep = self.daily_day >= cutoff
+        completions = self.daily_values['completions'][keep]
+        first_half = self.daily_day[keep] <= self._day(midpoint)
+        totals = {'days': int(keep.sum()),
+                  'first_half': int(completions[first_half].sum()),
+                  'second_half': int(completions[~first_half].sum())}
+        for column in SUM_COLUMNS[1:]:
+            totals[column] = self.daily_values[column][keep].sum().item()
+        return totals
+
+    def rolling_completion_rates(self, windows=(7, 30, 90), as_of=None):
+        """Same frame as HabitDatabase.rolling_completion_rates(windows, as_of)"""
+        cutoff = self._cutoff(max(windows))
+        if as_of is not None or not self._has_habit_rows(cutoff):
+            return self.db.rolling_completion_rates(windows, as_of)
+        keep = self.day >= cutoff
+        # Day numbers give the timestamps directly, without parsing date strings
+        daily = pd.DataFrame({
+            'habit_id': self.habit_id[keep],
+            'completed_date': pd.Timestamp(self.origin) + pd.to_timedelta(self.day[keep], unit='D'),
+            'completions': self.values['completions'][keep],
+        })
+        return rolling_rates(self.habits.copy(), daily, datetime.now(timezone.utc).date(),
+                             windows)
+
+    def get_journal_totals(self, start, end):
+        """Same rows as HabitDatabase.get_journal_totals(start, end).
+
+        Journal sentiment is only needed by the learned burnout model, so it
+        is read on first use rather than with the rest of the snapshot.
+        """
+        if self._day(start) < 0:
+            return self.db.get_journal_totals(start, end)
+        if self._journal is None:
+            self._journal = self.db.get_journal_totals(self.origin, '9999-12-31')
+        dates = self._journal['entry_date']
+        return self._journal[(dates >= str(start)) & (dates <= str(end))].reset_index(drop=True)
@@ -0,0 +1,534 @@
+"""Micro-benchmarks for the habit tracker's hot paths.
+
+Run with ``python benchmarks.py <name>``; every benchmark works on a
+throwaway database in a temporary directory, never on habit_tracker.db.
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from database import HabitDatabase
+
+
+def seed_database(db, habits=20, days=365, seed=42):
+    """Fill a database with synthetic habits and roughly daily logs"""
+    rng = random.Random(seed)
+    categories = ['Health', 'Work', 'Personal', 'Learning', 'Social']
+    for i in range(habits):
+        db.add_habit(f'Habit {i}', categories[i % len(categories)], rng.randint(1, 7))
+    today = datetime.now().date()
+    rows = []
+    for habit_id in range(1, habits + 1):
+        for offset in range(days):
+            if rng.random() < 0.7:
+                day = (today - timedelta(days=offset)).strftime('%Y-%m-%d')
+                rows.append((habit_id, day, rng.choice(['', 'good run', 'felt tired', 'gym']),
+                             rng.randint(1, 5), rng.randint(1, 5)))
+    return db.log_habits_bulk(rows)
+
+
+def timed(fn, repeat):
+    """Mean wall-clock milliseconds per call of fn"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def bench_connections(repeat=500):
+    """Per-query latency: fresh connection per query vs the pooled connection"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = HabitDatabase(os.path.join(tmp, 'bench.db'))
+        seed_database(db, habits=5, days=30)
+        query = 'SELECT COUNT(*) FROM habit_logs WHERE habit_id = ?'
+
+        def fresh():
+            conn = sqlite3.connect(db.db_name)
+            conn.execute(query, (1,)).fetchone()
+            conn.close()
+
+        def pooled():
+            db.connection().execute(query, (1,)).fetchone()
+
+        def thread_per_request():
+            # What Werkzeug's threaded server does for every request
+            worker = threading.Thread(target=pooled)
+            worker.start()
+            worker.join()
+
+        before = timed(fresh, repeat)
+        after = timed(pooled, repeat)
+        fds = len(os.listdir('/proc/self/fd')) if os.path.isdir('/proc/self/fd') else None
+        threaded = timed(thread_per_request, repeat)
+        open_connections = len(db.pool)
+        fds_after = len(os.listdir('/proc/self/fd')) if fds is not None else None
+        db.close()
+    print(f"fresh connection per query: {before:.3f} ms")
+    print(f"pooled connection:          {after:.3f} ms")
+    print(f"speedup:                    {before / after:.1f}x")
+    print(f"thread per request:         {threaded:.3f} ms, {open_connections} connection(s) "
+          f"left open after {repeat} threads"
+          + (f", {fds_after - fds:+d} file descriptors" if fds is not None else ""))
+
+
+def bench_streaks(habits=200, repeat=5):
+    """One get_current_streak call per habit vs a single get_all_streaks call"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = HabitDatabase(os.path.join(tmp, 'bench.db'))
+        seed_database(db, habits=habits, days=90)
+        ids = db.get_habits()['id'].tolist()
+        before = timed(lambda: [db.get_current_streak(habit_id) for habit_id in ids], repeat)
+        after = timed(db.get_all_streaks, repeat)
+        db.close()
+    print(f"{habits} x get_current_streak: {before:.1f} ms")
+    print(f"get_all_streaks:          {after:.1f} ms")
+
+
+def bench_read_cache(repeat=20):
+    """The windows one dashboard render asks for, cold vs served from the read cache"""
+    windows = (365, 30, 14, 7, 365)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = HabitDatabase(os.path.join(tmp, 'bench.db'))
+        seed_database(db, habits=20, days=365)
+
+        def cold():
+            db.cache.clear()
+            for days in windows:
+                db.get_habit_logs(days=days)
+
+        def warm():
+            for days in windows:
+                db.get_habit_logs(days=days)
+
+        before = timed(cold, repeat)
+        after = timed(warm, repeat)
+        stats = db.cache_stats()
+        db.close()
+    print(f"uncached render reads: {before:.1f} ms")
+    print(f"cached render reads:   {after:.1f} ms")
+    print(f"cache: {stats}")
+
+
+def bench_burnout(repeat=50):
+    """Burnout score from the per-habit rollup vs the daily_totals window"""
+    from burnout_predictor import BurnoutPredictor, score_totals, totals_from_rollup
+    midpoint = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
+    for habits in (20, 200):
+        with tempfile.TemporaryDirectory() as tmp:
+            db = HabitDatabase(os.path.join(tmp, 'bench.db'))
+            seed_database(db, habits=habits, days=90)
+            db.backfill_sentiment()
+            predictor = BurnoutPredictor(db)
+
+            def from_rollup():
+                db.cache.clear()
+                return score_totals(totals_from_rollup(db.get_daily_rollup(14), midpoint))
+
+            before = timed(from_rollup, repeat)
+            after = timed(lambda: predictor.calculate_burnout_score(14), repeat)
+            assert from_rollup() == predictor.calculate_burnout_score(14)
+            db.close()
+        print(f"{habits:>4} habits: rollup {before:.2f} ms, daily_totals {after:.2f} ms")
+
+
+def bench_burnout_series(days=365, window=14):
+    """A year of daily burnout scores: one query per day vs burnout_series"""
+    from burnout_predictor import BurnoutPredictor, score_totals
+    with tempfile.TemporaryDirectory() as tmp:
+        db = HabitDatabase(os.path.join(tmp, 'bench.db'))
+        seed_database(db, habits=20, days=days + window)
+        db.backfill_sentiment()
+        predictor = BurnoutPredictor(db)
+        today = datetime.now().date()
+
+        def per_day():
+            scores = []
+            for offset in range(days, -1, -1):
+                day = today - timedelta(days=offset)
+                rows = db.get_daily_totals(day - timedelta(days=window), day)
+                midpoint = (day - timedelta(days=window // 2)).isoformat()
+                totals = rows.drop(columns='completed_date').sum().to_dict()
+                totals.update(
+                    days=len(rows),
+                    first_half=rows.loc[rows['completed_date'] <= midpoint, 'completions'].sum(),
+                    second_half=rows.loc[rows['completed_date'] > midpoint, 'completions'].sum())
+                scores.append(score_totals(totals)[0] if len(rows) else 0)
+            return scores
+
+        before = timed(per_day, 1)
+        after = timed(lambda: predictor.burnout_series(window=window), 5)
+        assert per_day() == predictor.burnout_series(window=window)['score'].tolist()
+        db.close()
+    print(f"{days + 1} days, {window}-day window")
+    print(f"one query per day: {before:.1f} ms")
+    print(f"burnout_series:    {after:.1f} ms")
+
+
+def seed_seasonal(db, habits=10, days=365, period=60, seed=3):
+    """Synthetic history whose mood, energy and activity drift in cycles"""
+    import math
+    rng = random.Random(seed)
+    for i in range(habits):
+        db.add_habit(f'Habit {i}', 'Health', 7)
+    today = datetime.now().date()
+    rows = []
+    for offset in range(days):
+        wave = math.sin(2 * math.pi * offset / period)
+        for habit_id in range(1, habits + 1):
+            if rng.random() < 0.6 + 0.3 * wave:
+                score = lambda: min(5, max(1, round(3 + 1.5 * wave + rng.gauss(0, 0.8))))
+                rows.append((habit_id, (today - timedelta(days=offset)).isoformat(), '',
+                             score(), score()))
+    return db.log_habits_bulk(rows)
+
+
+def bench_forecast_backtest(points=120, horizons=(1, 7, 14)):
+    """Backtest TrendForecaster against the old 'mean of the last 7 days' baseline"""
+    import numpy as np
+    import pandas as pd
+    from forecasting import METRICS, TrendForecaster
+    with tempfile.TemporaryDirectory() as tmp:
+        db = HabitDatabase(os.path.join(tmp, 'bench.db'))
+        seed_seasonal(db)
+        forecaster = TrendForecaster(db)
+        today = pd.Timestamp(datetime.now().date())
+        actual = TrendForecaster(db, window=400).daily_series(today)
+
+        results, elapsed = [], 0.0
+        for back in range(max(horizons), max(horizons) + points):
+            now = today - pd.Timedelta(days=back)
+            start = time.perf_counter()
+            forecast = forecaster.forecast(now=now, horizons=horizons)
+            elapsed += time.perf_counter() - start
+            recent = actual.loc[now - pd.Timedelta(days=6):now].mean()
+            baseline = pd.DataFrame({'metric': list(METRICS) * len(horizons),
+                                     'method': 'last-7-mean',
+                                     'horizon': np.repeat(horizons, len(METRICS)),
+                                     'forecast': [recent[m] for m in METRICS] * len(horizons)})
+            baseline['date'] = now + pd.to_timedelta(baseline['horizon'], unit='D')
+            results.extend([forecast, baseline])
+        db.close()
+
+    results = pd.concat(results, ignore_index=True)
+    truth = actual.stack().rename('actual').rename_axis(['date', 'metric']).reset_index()
+    results = results.merge(truth, on=['date', 'metric'])
+    results['error'] = (results['forecast'] - results['actual']).abs()
+    results['covered'] = results['actual'].between(results['lower'], results['upper'])
+    summary = results.groupby(['metric', 'horizon', 'method']).agg(
+        mae=('error', 'mean'), band_coverage=('covered', 'mean'))
+    summary.loc[summary.index.get_level_values('method') == 'last-7-mean', 'band_coverage'] = np.nan
+    print(f"{points} backtest points, {elapsed / points * 1000:.2f} ms per forecast")
+    print(summary.unstack('method').round(3).to_string())
+
+
+def bench_correlations(habit_counts=(20, 2000), days=30):
+    """CorrelationEngine.habit_stats cold and cached as the number of habits grows"""
+    from correlations import CorrelationEngine
+    for habits in habit_counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = HabitDatabase(os.path.join(tmp, 'bench.db'))
+            seed_database(db, habits=habits, days=days + 1)
+            engine = CorrelationEngine(db, days=days)
+
+            def cold():
+                db.cache.clear()
+                return engine.habit_stats()
+
+            before = timed(cold, 5)
+            after = timed(engine.habit_stats, 50)
+            rated = engine.habit_stats()['mood_corr'].notna().sum()
+            db.close()
+        print(f"{habits:>5} habits x {days} days: cold {before:.1f} ms, cached {after:.2f} ms"
+              f" ({rated} habits correlated)")
+
+
+def bench_dashboard_reads(habits=20, days=400, repeat=10):
+    """Data reads of one dashboard render: per-call queries vs an AnalyticsSnapshot"""
+    from analytics import AnalyticsSnapshot
+    from burnout_predictor import BurnoutPredictor
+    with tempfile.TemporaryDirectory() as tmp:
+        db = HabitDatabase(os.path.join(tmp, 'bench.db'))
+        seed_database(db, habits=habits, days=days)
+        db.backfill_sentiment()
+        predictor = BurnoutPredictor(db)
+
+        def per_call():
+            db.cache.clear()
+            return (db.get_daily_rollup(days=30), predictor.calculate_burnout_score(days=14),
+                    db.rolling_completion_rates(windows=(7, 30)), predictor.burnout_series())
+
+        def snapshot():
+            snap = AnalyticsSnapshot(db)
+            return (snap.get_daily_rollup(days=30),
+                    predictor.calculate_burnout_score(days=14, snapshot=snap),
+                    snap.rolling_completion_rates(windows=(7, 30)),
+                    predictor.burnout_series(snapshot=snap))
+
+        results = {}
+        for name, fn in (('per-call queries', per_call), ('snapshot', snapshot)):
+            with db.count_queries() as queries:
+                fn()
+            results[name] = (timed(fn, repeat), sum(queries.values()))
+        assert per_call()[3]['score'].tolist() == snapshot()[3]['score'].tolist()
+        db.close()
+    print(f"{habits} habits x {days} days")
+    for name, (ms, queries) in results.items():
+        print(f"{name + ':':<18}{ms:7.1f} ms, {queries} queries")
+
+
+def bench_figure_cache(habits=20, days=400, repeat=20):
+    """Dashboard-style figures: built per render vs served by a FigureCache from memory or disk"""
+    import plotly.express as px
+    import plotly.graph_objs as go
+    from figure_cache import FigureCache
+    with tempfile.TemporaryDirectory() as tmp:
+        db = HabitDatabase(os.path.join(tmp, 'bench.db'))
+        seed_database(db, habits=habits, days=days)
+        rollup = db.get_daily_rollup(days=30)
+        totals = db.get_daily_totals('1970-01-01', '9999-12-31')
+
+        def bar():
+            return px.bar(rollup.groupby('name')['completions'].sum().reset_index(),
+                          x='name', y='completions', color='completions')
+
+        def line():
+            return go.Figure(go.Scatter(x=totals['completed_date'], y=totals['completions']))
+
+        def cached(cache):
+            return cache.figure('completions', 30, bar), cache.figure('history', 365, line)
+
+        path = os.path.join(tmp, 'figures.db')
+        warm = FigureCache(db, path=path)
+        uncached = timed(lambda: (bar().to_plotly_json(), line().to_plotly_json()), repeat)
+        cold = timed(lambda: (warm.clear(), cached(warm)), repeat)
+        memory = timed(lambda: cached(warm), repeat)
+        # Another worker: empty memory, figures already on disk
+        disk = timed(lambda: cached(FigureCache(db, path=path)), repeat)
+        stats = warm.stats()
+        db.close()
+    print(f"build per render:   {uncached:7.2f} ms")
+    print(f"cache miss:         {cold:7.2f} ms")
+    print(f"memory hit:         {memory:7.2f} ms")
+    print(f"disk hit (worker):  {disk:7.2f} ms")
+    print(f"stats: {stats}")
+
+
+def bench_leaderboard(user_counts=(1000, 10000, 100000, 1000000), repeat=200, seed=7):
+    """Leaderboard top-10, rank lookups and score updates as the number of users grows;
+    "remote rank" is a rank lookup right after a write from another process"""
+    import operator
+    from leaderboard import Leaderboard
+    rng = random.Random(seed)
+    for users in user_counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.db')
+            db = HabitDatabase(path)
+            with db.transaction() as cursor:
+                cursor.executemany('INSERT OR IGNORE INTO users (id, name) VALUES (?, ?)',
+                                   ((i, f'user {i}') for i in range(1, users + 1)))
+                cursor.executemany(
+                    "INSERT INTO leaderboard (board, category, user_id, score) VALUES ('points', '', ?, ?)",
+                    ((i, rng.randint(0, 50000)) for i in range(1, users + 1)))
+            board = Leaderboard(db)
+            start = time.perf_counter()
+            board.rank(1)
+            build = (time.perf_counter() - start) * 1000
+            ids = [rng.randint(1, users) for _ in range(repeat)]
+            picks = iter(ids * 3)
+
+            def sql_rank():
+                user_id = next(picks)
+                return db.connection().execute(
+                    '''SELECT COUNT(*) + 1 FROM leaderboard
+                       WHERE board = 'points' AND category = '' AND score > (
+                           SELECT score FROM leaderboard
+                           WHERE board = 'points' AND category = '' AND user_id = ?)''',
+                    (user_id,)).fetchone()
+
+            def update(database=db):
+                with database.transaction() as cursor:
+                    database._update_leaderboard(cursor, 'points', [('', next(picks), 10)],
+                                                 operator.add)
+
+            top = timed(lambda: board.top(k=10), repeat)
+            counted = timed(sql_rank, repeat)
+            ranked = timed(lambda: board.rank(next(picks)), repeat)
+            updated = timed(update, repeat)
+            # Stands in for another process: no listener ties it to `board`
+            other = HabitDatabase(path)
+            remote = 0.0
+            picks = iter(ids * 2)
+            for _ in range(repeat):
+                update(other)
+                start = time.perf_counter()
+                board.rank(next(picks))
+                remote += time.perf_counter() - start
+            remote = remote * 1000 / repeat
+            other.close()
+            assert board.rank(ids[0])[0] == db.connection().execute(
+                "SELECT COUNT(*) + 1 FROM leaderboard WHERE board = 'points' AND category = '' "
+                "AND score > ?", (board.rank(ids[0])[1],)).fetchone()[0]
+            board.close()
+            db.close()
+        print(f"{users:>8} users: top-10 {top:.3f} ms, rank {ranked:.3f} ms "
+              f"(SQL COUNT {counted:.3f} ms), update {updated:.3f} ms, "
+              f"remote rank {remote:.3f} ms, index build {build:.0f} ms")
+
+
+def bench_sentiment_batch(n=20000, workers=4):
+    """Scoring notes one at a time vs analyze_batch (dedup + process pool)"""
+    from sentiment_analyzer import SentimentAnalyzer, get_backend
+    rng = random.Random(7)
+    words = ['good', 'bad', 'tired', 'great', 'run', 'gym', 'slept', 'awful', 'happy', 'long']
+    texts = [' '.join(rng.choices(words, k=rng.randint(1, 6))) for _ in range(n)]
+
+    backend = get_backend(SentimentAnalyzer.backend)
+    start = time.perf_counter()
+    expected = [backend.score(text) for text in texts]
+    before = time.perf_counter() - start
+
+    SentimentAnalyzer.cache.memory.clear()
+    start = time.perf_counter()
+    scores = list(SentimentAnalyzer.analyze_batch(texts, workers=workers))
+    after = time.perf_counter() - start
+
+    assert scores == expected
+    print(f"{n:,} texts, {len(set(texts)):,} unique")
+    print(f"one at a time:           {n / before:,.0f} texts/s")
+    print(f"analyze_batch({workers} workers): {n / after:,.0f} texts/s")
+
+
+SAMPLE_NOTES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'sample_notes.txt')
+
+
+def load_sample_notes(path=SAMPLE_NOTES):
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+def bench_sentiment_backends(rounds=50):
+    """Throughput of every sentiment backend and its agreement with TextBlob"""
+    import numpy as np
+    from sentiment_analyzer import BACKENDS, SentimentAnalyzer, get_backend
+    notes = load_sample_notes()
+    # Straight to the backends: the sentiment cache would answer every round after the first
+    reference = [get_backend('textblob').score(note) for note in notes]
+    reference_categories = [SentimentAnalyzer.get_sentiment_category(s) for s in reference]
+    print(f"{len(notes)} sample notes x {rounds} rounds")
+    print(f"{'backend':<10} {'texts/s':>10} {'corr':>6} {'MAE':>6} {'category':>9}")
+    for name in BACKENDS:
+        backend = get_backend(name)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            scores = [backend.score(note) for note in notes]
+        rate = len(notes) * rounds / (time.perf_counter() - start)
+        corr = np.corrcoef(reference, scores)[0, 1]
+        mae = np.mean(np.abs(np.array(reference) - np.array(scores)))
+        agree = np.mean([SentimentAnalyzer.get_sentiment_category(s) == c
+                         for s, c in zip(scores, reference_categories)])
+        print(f"{name:<10} {rate:>10,.0f} {corr:>6.3f} {mae:>6.3f} {agree:>8.1%}")
+
+
+def bench_sentiment_cache(rounds=20):
+    """Scoring the sample notes cold, from the memory cache, and from the disk cache"""
+    from sentiment_analyzer import SentimentAnalyzer, SentimentCache
+    notes = load_sample_notes()
+    original = SentimentAnalyzer.cache
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            path = os.path.join(tmp, 'bench.db')
+            SentimentAnalyzer.cache = SentimentCache(path=path)
+            start = time.perf_counter()
+            expected = [SentimentAnalyzer.analyze_text(note) for note in notes]
+            cold = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for _ in range(rounds):
+                scores = [SentimentAnalyzer.analyze_text(note) for note in notes]
+            warm = (time.perf_counter() - start) / rounds
+            assert scores == expected
+
+            # A fresh process: empty memory, scores still on disk
+            SentimentAnalyzer.cache = SentimentCache(path=path)
+            start = time.perf_counter()
+            scores = [SentimentAnalyzer.analyze_text(note) for note in notes]
+            restored = time.perf_counter() - start
+            assert scores == expected
+            print(f"{len(notes)} sample notes ({SentimentAnalyzer.backend})")
+            print(f"cold:        {len(notes) / cold:>12,.0f} texts/s")
+            print(f"memory hit:  {len(notes) / warm:>12,.0f} texts/s")
+            print(f"disk hit:    {len(notes) / restored:>12,.0f} texts/s")
+            print(f"cache stats: {SentimentAnalyzer.cache_stats()}")
+        finally:
+            SentimentAnalyzer.cache.pool.close_all()
+            SentimentAnalyzer.cache = original
+
+
+# What importing sentiment_analyzer used to do before NLP loading became lazy
+EAGER_NLP_PRELUDE = (
+    "import nltk, textblob; "
+    "nltk.download('punkt', quiet=True); nltk.download('brown', quiet=True); "
+)
+
+
+def bench_startup(runs=5):
+    """Cold import time of App.py and kivy_app.py, with and without eager NLP loading"""
+    import statistics
+    import subprocess
+    repo = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=repo, KIVY_NO_ARGS='1', KIVY_NO_CONSOLELOG='1')
+
+    def cold_import(code, cwd):
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = subprocess.run([sys.executable, '-c', code], cwd=cwd, env=env,
+                                    capture_output=True, text=True)
+            times.append(time.perf_counter() - start)
+            if result.returncode != 0:
+                return None, result.stderr.strip().splitlines()[-1]
+        return statistics.median(times), None
+
+    # Run in a scratch directory so the apps create their database there
+    with tempfile.TemporaryDirectory() as tmp:
+        for module in ('App', 'kivy_app'):
+            lazy, error = cold_import(f"import {module}", tmp)
+            if error:
+                print(f"{module}: skipped ({error})")
+                continue
+            eager, _ = cold_import(EAGER_NLP_PRELUDE + f"import {module}", tmp)
+            print(f"{module}: eager NLP {eager * 1000:.0f} ms -> lazy {lazy * 1000:.0f} ms")
+
+
+BENCHMARKS = {
+    'connections': bench_connections,
+    'streaks': bench_streaks,
+    'read-cache': bench_read_cache,
+    'burnout': bench_burnout,
+    'burnout-series': bench_burnout_series,
+    'forecast-backtest': bench_forecast_backtest,
+    'correlations': bench_correlations,
+    'dashboard-reads': bench_dashboard_reads,
+    'figure-cache': bench_figure_cache,
+    'leaderboard': bench_leaderboard,
+    'sentiment-batch': bench_sentiment_batch,
+    'sentiment-backends': bench_sentiment_backends,
+    'sentiment-cache': bench_sentiment_cache,
+    'startup': bench_startup,
+}
+
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            sys.exit(f"Unknown benchmark '{name}'. Choose from: {', '.join(BENCHMARKS)}")
+        print("=" * 60)
+        print(f"Benchmark: {name}")
+        print("=" * 60)
+        BENCHMARKS[name]()
@@ -0,0 +1,237 @@
+"""Optional learned burnout model (logistic regression in pure NumPy).
+
+The model estimates the probability that the heuristic burnout score will
+be at or above `threshold` `horizon` days from now, from features of the
+last `window` days. extract_features() is the single feature pipeline used
+both for training and for serving, so the two can never drift apart.
+Trained weights are saved to a small .npz file and loaded once at startup
+by BurnoutPredictor; train with ``python manage.py train-burnout``.
+"""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MODEL_PATH = 'burnout_model.npz'
+
+FEATURES = (
+    'avg_energy', 'avg_mood', 'note_sentiment', 'journal_sentiment',
+    'completions_per_day', 'active_days', 'completion_decline', 'energy_change',
+)
+
+
+def _window_sum(values, window, lo, hi):
+    """Sum of values[i-lo .. i-hi] for every i >= window, via a cumulative sum"""
+    cs = np.concatenate(([0], np.cumsum(values, dtype=float)))
+    idx = np.arange(window, len(values))
+    return cs[idx - hi + 1] - cs[idx - lo]
+
+
+def _mean(total, count, default):
+    return np.divide(total, count, out=np.full(len(total), float(default)), where=count > 0)
+
+
+def extract_features(db, start, end, window=14):
+    """Feature matrix for every day from `start` to `end`: (dates, X).
+
+    Each row describes the `window` days up to and including that day,
+    like calculate_burnout_score(window) does. `db` may also be an
+    AnalyticsSnapshot. Missing averages fall back to
+    neutral values (3 for mood/energy, 0 for sentiment).
+    """
+    end = pd.Timestamp(end).normalize()
+    start = min(pd.Timestamp(start).normalize(), end)
+    first = start - pd.Timedelta(days=window)
+    calendar = pd.date_range(first, end, freq='D')
+
+    def on_calendar(frame, date_column):
+        return (frame.assign(**{date_column: pd.to_datetime(frame[date_column])})
+                     .set_index(date_column)
+                     .reindex(calendar, fill_value=0))
+
+    totals = on_calendar(db.get_daily_totals(first.date(), end.date()), 'completed_date')
+    journal = on_calendar(db.get_journal_totals(first.date(), end.date()), 'entry_date')
+    column = lambda frame, name: frame[name].to_numpy(dtype=float)
+
+    def full(frame, name):
+        return _window_sum(column(frame, name), window, window, 0)
+
+    half = window // 2
+    first_half = _window_sum(column(totals, 'completions'), window, window, half)
+    second_half = _window_sum(column(totals, 'completions'), window, half - 1, 0)
+    energy_first = _mean(_window_sum(column(totals, 'energy_sum'), window, window, half),
+                         _window_sum(column(totals, 'energy_count'), window, window, half), 3)
+    energy_second = _mean(_window_sum(column(totals, 'energy_sum'), window, half - 1, 0),
+                          _window_sum(column(totals, 'energy_count'), window, half - 1, 0), 3)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        decline = np.where((first_half > 0) & (second_half > 0),
+                           (first_half - second_half) / first_half, 0)
+
+    X = np.column_stack([
+        _mean(full(totals, 'energy_sum'), full(totals, 'energy_count'), 3),
+        _mean(full(totals, 'mood_sum'), full(totals, 'mood_count'), 3),
+        _mean(full(totals, 'sentiment_sum'), full(totals, 'sentiment_count'), 0),
+        _mean(full(journal, 'sentiment_sum'), full(journal, 'sentiment_count'), 0),
+        full(totals, 'completions') / (window + 1),
+        _window_sum((column(totals, 'completions') > 0).astype(float), window, window, 0)
+        / (window + 1),
+        decline,
+        energy_second - energy_first,
+    ])
+    return calendar[window:], X
+
+
+def _sigmoid(z):
+    return 1 / (1 + np.exp(-np.clip(z, -35, 35)))
+
+
+class BurnoutModel:
+    """Standardized logistic regression over FEATURES"""
+
+    def __init__(self, weights, bias, mean, scale, window=14, horizon=7, threshold=40.0):
+        self.weights = np.asarray(weights, dtype=float)
+        self.bias = float(bias)
+        self.mean = np.asarray(mean, dtype=float)
+        self.scale = np.asarray(scale, dtype=float)
+        self.window = int(window)
+        self.horizon = int(horizon)
+        self.threshold = float(threshold)
+        # Fold standardization into the weights so inference is one dot product
+        self._coef = self.weights / self.scale
+        self._intercept = self.bias - self.mean @ self._coef
+
+    @classmethod
+    def fit(cls, X, y, window=14, horizon=7, threshold=40.0, l2=1e-2, iterations=50):
+        """Fit with Newton's method (IRLS) and a small L2 penalty"""
+        y = np.asarray(y, dtype=float)
+        if y.min() == y.max():
+            raise ValueError("training labels contain a single class; "
+                             "try a lower threshold or more history")
+        mean = X.mean(axis=0)
+        scale = X.std(axis=0)
+        scale[scale == 0] = 1.0
+        Z = np.column_stack([np.ones(len(X)), (X - mean) / scale])
+        beta = np.zeros(Z.shape[1])
+        penalty = np.full(Z.shape[1], l2)
+        penalty[0] = 0.0        # the intercept is not shrunk
+        for _ in range(iterations):
+            p = _sigmoid(Z @ beta)
+            gradient = Z.T @ (p - y) + penalty * beta
+            hessian = (Z.T * (p * (1 - p))) @ Z + np.diag(penalty)
+            step = np.linalg.solve(hessian, gradient)
+            beta -= step
+            if np.abs(step).max() < 1e-8:
+                break
+        return cls(beta[1:], beta[0], mean, scale, window, horizon, threshold)
+
+    def predict_proba(self, X):
+        """Probability of a burnout score >= threshold `horizon` days later"""
+        return _sigmoid(np.asarray(X, dtype=float) @ self._coef + self._intercept)
+
+    def save(self, path=DEFAULT_MODEL_PATH):
+        # np.savez appends .npz to bare names; open the file ourselves to keep `path`
+        with open(path, 'wb') as f:
+            np.savez_compressed(
+                f, weights=self.weights, bias=self.bias, mean=self.mean, scale=self.scale,
+                window=self.window, horizon=self.horizon, threshold=self.threshold,
+                features=np.array(FEATURES)
+            )
+        return path
+
+    @classmethod
+    def load(cls, path=DEFAULT_MODEL_PATH):
+        with np.load(path) as data:
+            if tuple(data['features']) != FEATURES:
+                raise ValueError(f"{path} was trained on different features")
+            return cls(data['weights'], data['bias'], data['mean'], data['scale'],
+                       data['window'], data['horizon'], data['threshold'])
+
+    @classmethod
+    def load_if_present(cls, path=DEFAULT_MODEL_PATH):
+        """The saved model, or None when there is none (or it is stale)"""
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            return cls.load(path)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Ignoring burnout model {path}: {e}")
+            return None
+
+
+def training_set(db, predictor, window=14, horizon=7, threshold=40.0, days=730):
+    """(dates, X, y, heuristic): features per day and whether the heuristic
+    score `horizon` days later reached `threshold`; heuristic is the
+    score on the day itself, for comparison."""
+    today = pd.Timestamp.now().normalize()
+    last = today - pd.Timedelta(days=horizon)
+    start = last - pd.Timedelta(days=days)
+    dates, X = extract_features(db, start, last, window)
+    scores = predictor.burnout_series(start, today, window).set_index('date')['score']
+    y = (scores.reindex(dates + pd.Timedelta(days=horizon)).to_numpy() >= threshold)
+    heuristic = scores.reindex(dates).to_numpy()
+    # Days before any logs carry no signal
+    active = X[:, FEATURES.index('active_days')] > 0
+    return dates[active], X[active], y[active].astype(float), heuristic[active]
+
+
+def auc(y, score):
+    """Area under the ROC curve via the rank-sum statistic"""
+    ranks = pd.Series(score).rank().to_numpy()
+    positives = y == 1
+    n_pos, n_neg = positives.sum(), (~positives).sum()
+    if not n_pos or not n_neg:
+        return float('nan')
+    return (ranks[positives].sum() - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg)
+
+
+def calibration_table(y, p, bins=5):
+    """Mean predicted probability vs observed rate per probability bin"""
+    edges = np.linspace(0, 1, bins + 1)
+    which = np.clip(np.digitize(p, edges[1:-1]), 0, bins - 1)
+    frame = pd.DataFrame({'bin': which, 'predicted': p, 'observed': y})
+    table = frame.groupby('bin').agg(predicted=('predicted', 'mean'),
+                                     observed=('observed', 'mean'),
+                                     days=('observed', 'size'))
+    table.index = [f'{edges[i]:.1f}-{edges[i + 1]:.1f}' for i in table.index]
+    return table
+
+
+def train(db, predictor, window=14, horizon=7, threshold=40.0, days=730, holdout=0.2):
+    """Fit on the older days, evaluate on the most recent `holdout` share.
+
+    Returns (model, report) where report holds timings and holdout metrics
+    for the model and for today's heuristic score as a predictor.
+    """
+    dates, X, y, heuristic = training_set(db, predictor, window, horizon, threshold, days)
+    if len(y) < 20:
+        raise ValueError(f"only {len(y)} days of history to train on")
+    split = int(len(y) * (1 - holdout))
+    start = time.perf_counter()
+    model = BurnoutModel.fit(X[:split], y[:split], window, horizon, threshold)
+    train_seconds = time.perf_counter() - start
+
+    # Final model on everything, evaluated above on data it had not seen
+    model_all = BurnoutModel.fit(X, y, window, horizon, threshold)
+
+    test_X, test_y = X[split:], y[split:]
+    p = model.predict_proba(test_X)
+    row = X[-1:]
+    runs = 10000
+    start = time.perf_counter()
+    for _ in range(runs):
+        model_all.predict_proba(row)
+    latency = (time.perf_counter() - start) / runs
+
+    report = {
+        'days': len(y),
+        'positive_rate': float(y.mean()),
+        'train_seconds': train_seconds,
+        'inference_microseconds': latency * 1e6,
+        'brier': float(np.mean((p - test_y) ** 2)),
+        'brier_base_rate': float(np.mean((y[:split].mean() - test_y) ** 2)),
+        'auc_model': auc(test_y, p),
+        'auc_heuristic': auc(test_y, heuristic[split:]),
+        'calibration': calibration_table(test_y, p),
+    }
+    return model_all, report
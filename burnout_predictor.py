@@ -2,84 +2,197 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
+from burnout_model import DEFAULT_MODEL_PATH, BurnoutModel, extract_features
+from correlations import CorrelationEngine
+from database import ratio
+from forecasting import TrendForecaster
+
+def score_totals(totals):
+    """Burnout score (0-100) and recommendation from HabitDatabase.window_totals()"""
+    # Factors that contribute to burnout
+    factors = {
+        'low_energy': 0,
+        'low_mood': 0,
+        'declining_completion': 0,
+        'negative_sentiment': 0
+    }
+    
+    # Calculate average energy and mood
+    avg_energy = ratio(totals['energy_sum'], totals['energy_count'])
+    avg_mood = ratio(totals['mood_sum'], totals['mood_count'])
+    
+    # Low energy indicator (scale 1-5, below 2.5 is concerning)
+    if avg_energy < 2.5:
+        factors['low_energy'] = (2.5 - avg_energy) / 2.5 * 30
+    
+    # Low mood indicator
+    if avg_mood < 2.5:
+        factors['low_mood'] = (2.5 - avg_mood) / 2.5 * 30
+    
+    # Declining completion rate
+    first_half = totals['first_half']
+    second_half = totals['second_half']
+    
+    if first_half and second_half:
+        completion_decline = (first_half - second_half) / first_half
+        if completion_decline > 0:
+            factors['declining_completion'] = int(completion_decline * 25)
+    
+    # Sentiment in notes
+    avg_sentiment = ratio(totals['sentiment_sum'], totals['sentiment_count'])
+    if avg_sentiment < -0.2:
+        factors['negative_sentiment'] = abs(avg_sentiment) * 15
+    
+    # Calculate total burnout score (0-100)
+    burnout_score = min(sum(factors.values()), 100)
+    
+    # Generate recommendation
+    if burnout_score > 70:
+        recommendation = "High burnout risk! Consider taking a break and reducing commitments."
+    elif burnout_score > 40:
+        recommendation = "Moderate burnout risk. Focus on self-care and prioritize rest."
+    else:
+        recommendation = "You're doing well! Keep maintaining balance."
+    
+    return round(burnout_score, 1), recommendation
+
+
+def totals_from_rollup(rollup, midpoint):
+    """The window_totals() dict computed from per-habit rollup rows.
+    
+    Reference for `manage.py verify-burnout`, which checks that the
+    daily_totals read by calculate_burnout_score agrees with it.
+    """
+    sums = rollup[['mood_sum', 'mood_count', 'energy_sum', 'energy_count',
+                   'sentiment_sum', 'sentiment_count']].sum()
+    totals = {'days': rollup['completed_date'].nunique(),
+              'first_half': rollup.loc[rollup['completed_date'] <= midpoint, 'completions'].sum(),
+              'second_half': rollup.loc[rollup['completed_date'] > midpoint, 'completions'].sum()}
+    totals.update(sums.to_dict())
+    return totals
+
+
+def _ratio(total, count):
+    """Elementwise ratio() over arrays: the mean, or NaN where count is 0"""
+    return np.divide(total, count, out=np.full(len(total), np.nan), where=count > 0)
+
+
 class BurnoutPredictor:
-    def __init__(self, database):
+    def __init__(self, database, model_path=DEFAULT_MODEL_PATH):
         self.db = database
+        self.correlations = CorrelationEngine(database)
+        # Learned model from `manage.py train-burnout`, loaded once if present
+        self.model = BurnoutModel.load_if_present(model_path)
     
-    def calculate_burnout_score(self, days=14):
-        """Calculate burnout risk score based on recent data"""
-        logs = self.db.get_habit_logs(days=days)
-        
-        if logs.empty:
+    def calculate_burnout_score(self, days=14, snapshot=None):
+        """Calculate burnout risk score based on recent data.
+        
+        Reads `snapshot` (an AnalyticsSnapshot) instead of the database when given.
+        """
+        midpoint = (datetime.now() - timedelta(days=days//2)).strftime('%Y-%m-%d')
+        if snapshot is None:
+            # Sentiment in notes is scored when logged; older rows are scored once here
+            self.db.backfill_sentiment(days=days)
+        totals = (snapshot or self.db).window_totals(days, midpoint)
+        
+        if not totals['days']:
             return 0, "Insufficient data"
         
-        # Factors that contribute to burnout
-        factors = {
-            'low_energy': 0,
-            'low_mood': 0,
-            'declining_completion': 0,
-            'negative_sentiment': 0
-        }
-        
-        # Calculate average energy and mood
-        avg_energy = logs['energy_level'].mean()
-        avg_mood = logs['mood_score'].mean()
-        
-        # Low energy indicator (scale 1-5, below 2.5 is concerning)
-        if avg_energy < 2.5:
-            factors['low_energy'] = (2.5 - avg_energy) / 2.5 * 30
-        
-        # Low mood indicator
-        if avg_mood < 2.5:
-            factors['low_mood'] = (2.5 - avg_mood) / 2.5 * 30
-        
-        # Declining completion rate
-        first_half = logs[logs['completed_date'] <= 
-                         (datetime.now() - timedelta(days=days//2)).strftime('%Y-%m-%d')]
-        second_half = logs[logs['completed_date'] > 
-                          (datetime.now() - timedelta(days=days//2)).strftime('%Y-%m-%d')]
-        
-        if not first_half.empty and not second_half.empty:
-            completion_decline = (len(first_half) - len(second_half)) / len(first_half)
-            if completion_decline > 0:
-                factors['declining_completion'] = int(completion_decline * 25)
-        
-        # Sentiment in notes
-        if 'notes' in logs.columns:
-            from sentiment_analyzer import SentimentAnalyzer
-            sentiments = logs['notes'].apply(SentimentAnalyzer.analyze_text)
-            avg_sentiment = sentiments.mean()
-            if avg_sentiment < -0.2:
-                factors['negative_sentiment'] = abs(avg_sentiment) * 15
-        
-        # Calculate total burnout score (0-100)
-        burnout_score = min(sum(factors.values()), 100)
-        
-        # Generate recommendation
-        if burnout_score > 70:
-            recommendation = "High burnout risk! Consider taking a break and reducing commitments."
-        elif burnout_score > 40:
-            recommendation = "Moderate burnout risk. Focus on self-care and prioritize rest."
-        else:
-            recommendation = "You're doing well! Keep maintaining balance."
-        
-        return round(burnout_score, 1), recommendation
+        return score_totals(totals)
 
     
+    def predict_burnout_risk(self, now=None, snapshot=None):
+        """Learned probability (0-100) of elevated burnout `model.horizon` days out.
+        
+        None when no trained model is installed.
+        """
+        if self.model is None:
+            return None
+        now = now or datetime.now().date()
+        _, features = extract_features(snapshot or self.db, now, now, self.model.window)
+        return round(float(self.model.predict_proba(features)[0]) * 100, 1)
+    
+    def burnout_series(self, start=None, end=None, window=14, snapshot=None):
+        """Burnout score for every day from `start` to `end` (default: the past year).
+        
+        Each day is scored as calculate_burnout_score(window) would have
+        scored it on that day, from one read of daily_totals: per-day sums are
+        laid on a calendar and every window is a difference of cumulative
+        sums. Returns a DataFrame with a row per day: date, score and the
+        four factor columns. Reads `snapshot` instead of the database when given.
+        """
+        end = pd.Timestamp(end or datetime.now().date()).normalize()
+        start = pd.Timestamp(start or end - pd.Timedelta(days=365)).normalize()
+        half = window // 2
+        if start > end:
+            start = end
+        
+        if snapshot is None:
+            # Sentiment in notes is scored when logged; older rows are scored once here
+            self.db.backfill_sentiment(days=(datetime.now() - start).days + window)
+        first = start - pd.Timedelta(days=window)
+        totals = (snapshot or self.db).get_daily_totals(first.date(), end.date())
+        calendar = pd.date_range(first, end, freq='D')
+        totals = (totals.assign(completed_date=pd.to_datetime(totals['completed_date']))
+                        .set_index('completed_date')
+                        .reindex(calendar, fill_value=0))
+        
+        # cs[i] - cs[j] is the sum over calendar days j..i-1
+        def cumulative(column, dtype=float):
+            return np.concatenate(([0], np.cumsum(totals[column].to_numpy(dtype=dtype))))
+        
+        def rolling(cs, lo, hi):
+            # Sum over calendar days d-lo .. d-hi for every scored day d
+            idx = np.arange(window, len(calendar))
+            return cs[idx - hi + 1] - cs[idx - lo]
+        
+        days = rolling(cumulative('completions', bool), window, 0)
+        completions = cumulative('completions', np.int64)
+        # Windows run from d-window to d inclusive, split after d-window//2
+        first_half = rolling(completions, window, half)
+        second_half = rolling(completions, half - 1, 0)
+        sums = {column: rolling(cumulative(column), window, 0)
+                for column in ('mood_sum', 'mood_count', 'energy_sum', 'energy_count',
+                               'sentiment_sum', 'sentiment_count')}
+        
+        # score_totals() on arrays; NaN averages compare False like the scalar path
+        avg_energy = _ratio(sums['energy_sum'], sums['energy_count'])
+        avg_mood = _ratio(sums['mood_sum'], sums['mood_count'])
+        avg_sentiment = _ratio(sums['sentiment_sum'], sums['sentiment_count'])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            low_energy = np.where(avg_energy < 2.5, (2.5 - avg_energy) / 2.5 * 30, 0)
+            low_mood = np.where(avg_mood < 2.5, (2.5 - avg_mood) / 2.5 * 30, 0)
+            decline = np.where((first_half > 0) & (second_half > 0),
+                               (first_half - second_half) / first_half, 0)
+            declining = np.where(decline > 0, np.trunc(decline * 25), 0)
+            negative = np.where(avg_sentiment < -0.2, np.abs(avg_sentiment) * 15, 0)
+        score = np.minimum(low_energy + low_mood + declining + negative, 100)
+        
+        return pd.DataFrame({
+            'date': calendar[window:],
+            # Python's round() so every day matches calculate_burnout_score exactly
+            'score': [round(value, 1) if active else 0
+                      for value, active in zip(score.tolist(), days > 0)],
+            'low_energy': low_energy,
+            'low_mood': low_mood,
+            'declining_completion': declining,
+            'negative_sentiment': negative,
+        })
+    
     def find_correlations(self):
         """Find relationships between habits and mood/energy"""
-        logs = self.db.get_habit_logs(days=30)
+        stats = self.correlations.habit_stats(days=30)
         
-        if logs.empty:
+        if stats.empty:
             return "Not enough data yet"
         
         insights = []
+        overall_avg = ratio(stats['energy_sum'].sum(), stats['energy_count'].sum())
         
         # Group by category
-        for category in logs['category'].unique():
-            cat_logs = logs[logs['category'] == category]
-            cat_avg_energy = cat_logs['energy_level'].mean()
-            overall_avg = logs['energy_level'].mean()
+        by_category = stats.groupby('category', sort=False)[['energy_sum', 'energy_count']].sum()
+        for category, row in by_category.iterrows():
+            cat_avg_energy = ratio(row['energy_sum'], row['energy_count'])
             
             diff = cat_avg_energy - overall_avg
             
@@ -88,18 +201,27 @@ class BurnoutPredictor:
             elif diff < -0.5:
                 insights.append(f"⚠️ {category} habits drain your energy by {abs(diff):.1f} points")
         
+        # Habits that move the next day's mood/energy the most
+        for target in ('energy', 'mood'):
+            corr = stats.set_index('name')[f'{target}_corr'].dropna()
+            for name, r in corr[corr.abs() >= 0.3].sort_values(key=abs, ascending=False).head(3).items():
+                if r > 0:
+                    insights.append(f"📈 Days with {name} are followed by higher {target} (r={r:.2f})")
+                else:
+                    insights.append(f"📉 Days with {name} are followed by lower {target} (r={r:.2f})")
+        
         return insights if insights else ["Keep logging to discover patterns!"]
     
-    def predict_next_week(self):
+    def predict_next_week(self, now=None):
         """Predict burnout risk for next week"""
-        # Get trend from last 2 weeks
-        week1 = self.db.get_habit_logs(days=14)
-        week2 = self.db.get_habit_logs(days=7)
+        # Energy a week out on the last 2 weeks' trend, vs its current level
+        forecast = TrendForecaster(self.db, window=14).forecast(now=now, horizons=(7,))
+        energy = forecast[forecast['metric'] == 'energy'].set_index('method')['forecast']
         
-        if week1.empty or week2.empty:
+        if energy.isna().any():
             return "Need more data"
         
-        energy_trend = week2['energy_level'].mean() - week1['energy_level'].mean()
+        energy_trend = energy['trend'] - energy['ewma']
         
         if energy_trend < -0.5:
             return "⚠️ Warning: Energy declining. Consider lighter week ahead."
@@ -110,11 +232,12 @@ class BurnoutPredictor:
     
     def get_best_performing_habits(self):
         """Find habits that correlate with best mood"""
-        logs = self.db.get_habit_logs(days=30)
+        stats = self.correlations.habit_stats(days=30)
         
-        if logs.empty:
+        if stats.empty:
             return []
         
-        habit_moods = logs.groupby('name')['mood_score'].mean().sort_values(ascending=False)
+        per_habit = stats.groupby('name')[['mood_sum', 'mood_count']].sum()
+        habit_moods = (per_habit['mood_sum'] / per_habit['mood_count']).sort_values(ascending=False)
         
         return habit_moods.head(3).to_dict()
\ No newline at end of file
@@ -0,0 +1,90 @@
+"""Habit x mood/energy correlation engine.
+
+Builds one habit-by-day completion matrix from the daily rollup and
+correlates every habit with the *next* day's average mood and energy in a
+single matrix-vector product per target. Results are kept in the
+database's read cache under its data generation, so they are recomputed
+only after new logs arrive. A dense float matrix is used: even thousands
+of habits over a year is a few megabytes.
+"""
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+TARGETS = ('mood', 'energy')
+
+
+def lagged_correlations(matrix, target):
+    """Pearson r of each row of `matrix` (habits x days) with `target` one day later.
+
+    Days whose next-day target is NaN are left out. Rows that never vary
+    get NaN.
+    """
+    x = matrix[:, :-1]
+    y = target[1:]
+    keep = ~np.isnan(y)
+    x, y = x[:, keep], y[keep]
+    if y.size < 3:
+        return np.full(matrix.shape[0], np.nan)
+    xc = x - x.mean(axis=1, keepdims=True)
+    yc = y - y.mean()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (xc @ yc) / (np.sqrt((xc * xc).sum(axis=1)) * np.sqrt(yc @ yc))
+
+
+class CorrelationEngine:
+    def __init__(self, database, days=30):
+        self.db = database
+        self.days = days
+
+    def habit_stats(self, days=None):
+        """One row per habit logged in the last `days` days.
+
+        Columns: habit_id, name, category, completions, mood_sum,
+        mood_count, energy_sum, energy_count, and the lagged correlations
+        mood_corr and energy_corr.
+        """
+        days = int(days or self.days)
+        today = datetime.now(timezone.utc).date()
+        key = ('correlations', self.db.generation, today, days)
+        entry = self.db.cache.get(key)
+        if entry is None:
+            entry = (days, self._compute(days, today))
+            self.db.cache.put(key, entry)
+        return entry[1].copy()
+
+    def _compute(self, days, today):
+        rollup = self.db.get_daily_rollup(days=days)
+        columns = ['habit_id', 'name', 'category', 'completions', 'mood_sum', 'mood_count',
+                   'energy_sum', 'energy_count']
+        if rollup.empty:
+            return pd.DataFrame(columns=columns + ['mood_corr', 'energy_corr'])
+
+        # Same window as get_daily_rollup: today - days .. today (UTC)
+        start = today - timedelta(days=days)
+        calendar = pd.date_range(start, today, freq='D')
+        habit_codes, habit_ids = pd.factorize(rollup['habit_id'], sort=True)
+        day_codes = (pd.to_datetime(rollup['completed_date']) - pd.Timestamp(start)).dt.days.to_numpy()
+        in_window = (day_codes >= 0) & (day_codes < len(calendar))
+        matrix = np.zeros((len(habit_ids), len(calendar)))
+        np.add.at(matrix, (habit_codes[in_window], day_codes[in_window]),
+                  rollup['completions'].to_numpy()[in_window])
+
+        totals = (self.db.get_daily_totals(start, today)
+                      .assign(completed_date=lambda df: pd.to_datetime(df['completed_date']))
+                      .set_index('completed_date')
+                      .reindex(calendar))
+        stats = (rollup.groupby('habit_id', sort=True)
+                       .agg(name=('name', 'first'), category=('category', 'first'),
+                            completions=('completions', 'sum'),
+                            mood_sum=('mood_sum', 'sum'), mood_count=('mood_count', 'sum'),
+                            energy_sum=('energy_sum', 'sum'), energy_count=('energy_count', 'sum'))
+                       .reset_index())
+        for target in TARGETS:
+            count = totals[f'{target}_count'].to_numpy(dtype=float)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                daily = np.where(count > 0, totals[f'{target}_sum'].to_numpy(dtype=float) / count,
+                                 np.nan)
+            stats[f'{target}_corr'] = lagged_correlations(matrix, daily)
+        return stats
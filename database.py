@@ -1,154 +1,1255 @@
+import operator
 import sqlite3
-from datetime import datetime, timedelta
+import threading
+import time
+import weakref
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+from itertools import tee
+from datetime import datetime, timedelta, timezone
+import numpy as np
 import pandas as pd
 
+import achievements
+import migrations
+from cache import LRUCache
+
+# Pragmas applied to every pooled connection. WAL lets the Dash workers read
+# while another thread writes; NORMAL sync is safe under WAL and much cheaper
+# than FULL for our many tiny commits.
+CONNECTION_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('busy_timeout', 5000),
+    ('cache_size', -8000),        # ~8 MB page cache
+    ('mmap_size', 64 * 1024 * 1024),
+    ('temp_store', 'MEMORY'),
+)
+
+EXPORT_COLUMNS = ['id', 'habit_id', 'completed_date', 'notes', 'mood_score',
+                  'energy_level', 'name', 'category']
+EXPORT_COLUMNS_SQL = [f'hl.{column}' for column in EXPORT_COLUMNS[:6]] + ['h.name', 'h.category']
+
+LOGS_SINCE_SQL = '''
+    SELECT hl.*, h.name, h.category 
+    FROM habit_logs hl
+    JOIN habits h ON hl.habit_id = h.id
+    WHERE hl.completed_date >= date('now', ?)
+'''
+
+# Current and longest streak for every habit in one pass (gaps-and-islands):
+# consecutive days minus their row number is constant within a run.
+STREAKS_SQL = '''
+    WITH days AS (
+        SELECT DISTINCT habit_id, julianday(date(completed_date)) AS day
+        FROM habit_logs
+        {where}
+    ),
+    runs AS (
+        SELECT habit_id, COUNT(*) AS length, MAX(day) AS last_day
+        FROM (
+            SELECT habit_id, day,
+                   day - ROW_NUMBER() OVER (PARTITION BY habit_id ORDER BY day) AS grp
+            FROM days
+        )
+        GROUP BY habit_id, grp
+    ),
+    ranked AS (
+        SELECT habit_id, length, last_day,
+               ROW_NUMBER() OVER (PARTITION BY habit_id ORDER BY last_day DESC) AS rn
+        FROM runs
+    )
+    SELECT habit_id,
+           MAX(CASE WHEN rn = 1 THEN length END) AS latest_length,
+           date(MAX(CASE WHEN rn = 1 THEN last_day END)) AS last_completed_date,
+           MAX(length) AS longest_streak
+    FROM ranked
+    GROUP BY habit_id
+'''
+
+ROLLUP_SINCE_SQL = '''
+    SELECT r.*, h.name, h.category
+    FROM daily_habit_rollup r
+    JOIN habits h ON r.habit_id = h.id
+    WHERE r.completed_date >= date('now', ?)
+'''
+
+# One log folded into its (day, habit) rollup row
+ROLLUP_UPSERT_SQL = '''
+    INSERT INTO daily_habit_rollup
+        (completed_date, habit_id, completions, mood_sum, mood_count, energy_sum, energy_count,
+         sentiment_sum, sentiment_count)
+    VALUES (:date, :habit_id, 1, COALESCE(:mood, 0), :mood IS NOT NULL,
+            COALESCE(:energy, 0), :energy IS NOT NULL,
+            COALESCE(:sentiment, 0), :sentiment IS NOT NULL)
+    ON CONFLICT (completed_date, habit_id) DO UPDATE SET
+        completions = completions + 1,
+        mood_sum = mood_sum + excluded.mood_sum,
+        mood_count = mood_count + excluded.mood_count,
+        energy_sum = energy_sum + excluded.energy_sum,
+        energy_count = energy_count + excluded.energy_count,
+        sentiment_sum = sentiment_sum + excluded.sentiment_sum,
+        sentiment_count = sentiment_count + excluded.sentiment_count
+'''
+
+# The same log folded into its day's totals across all habits
+DAILY_TOTALS_UPSERT_SQL = '''
+    INSERT INTO daily_totals
+        (completed_date, completions, mood_sum, mood_count, energy_sum, energy_count,
+         sentiment_sum, sentiment_count)
+    VALUES (:date, 1, COALESCE(:mood, 0), :mood IS NOT NULL,
+            COALESCE(:energy, 0), :energy IS NOT NULL,
+            COALESCE(:sentiment, 0), :sentiment IS NOT NULL)
+    ON CONFLICT (completed_date) DO UPDATE SET
+        completions = completions + 1,
+        mood_sum = mood_sum + excluded.mood_sum,
+        mood_count = mood_count + excluded.mood_count,
+        energy_sum = energy_sum + excluded.energy_sum,
+        energy_count = energy_count + excluded.energy_count,
+        sentiment_sum = sentiment_sum + excluded.sentiment_sum,
+        sentiment_count = sentiment_count + excluded.sentiment_count
+'''
+
+# Totals of an N-day window (one row per day read), split at a midpoint date
+WINDOW_TOTALS_SQL = '''
+    SELECT COUNT(*) AS days,
+           COALESCE(SUM(CASE WHEN completed_date <= :midpoint THEN completions END), 0)
+               AS first_half,
+           COALESCE(SUM(CASE WHEN completed_date > :midpoint THEN completions END), 0)
+               AS second_half,
+           COALESCE(SUM(mood_sum), 0) AS mood_sum, COALESCE(SUM(mood_count), 0) AS mood_count,
+           COALESCE(SUM(energy_sum), 0) AS energy_sum,
+           COALESCE(SUM(energy_count), 0) AS energy_count,
+           COALESCE(SUM(sentiment_sum), 0) AS sentiment_sum,
+           COALESCE(SUM(sentiment_count), 0) AS sentiment_count
+    FROM daily_totals
+    WHERE completed_date >= date('now', :window)
+'''
+
+# Completions per habit in an inclusive date range, zero for idle habits
+COMPLETIONS_SQL = '''
+    SELECT h.id AS habit_id, h.name, h.category, h.target_frequency,
+           COALESCE(w.actual, 0) AS actual
+    FROM habits h
+    LEFT JOIN (
+        SELECT habit_id, SUM(completions) AS actual
+        FROM daily_habit_rollup
+        WHERE completed_date >= ? AND completed_date <= ?
+        GROUP BY habit_id
+    ) w ON w.habit_id = h.id
+    ORDER BY h.id
+'''
+
+# Sum columns shared by daily_habit_rollup and daily_totals
+SUM_COLUMNS = ('completions', 'mood_sum', 'mood_count', 'energy_sum', 'energy_count',
+               'sentiment_sum', 'sentiment_count')
+
+# Everything a dashboard render reads (see analytics.AnalyticsSnapshot):
+# per-habit rollup rows since :habit_origin, and daily_totals rows (as
+# habit_id 0) since :origin, with day numbers counted from :origin
+SNAPSHOT_SQL = f'''
+    SELECT habit_id, CAST(julianday(completed_date) - julianday(:origin) AS INTEGER) AS day,
+           {', '.join(SUM_COLUMNS)}
+    FROM (
+        SELECT habit_id, completed_date, {', '.join(SUM_COLUMNS)}
+        FROM daily_habit_rollup WHERE completed_date >= :habit_origin
+        UNION ALL
+        SELECT 0, completed_date, {', '.join(SUM_COLUMNS)}
+        FROM daily_totals WHERE completed_date >= :origin
+    )
+'''
+
+HABITS_SQL = 'SELECT id AS habit_id, name, category, target_frequency FROM habits ORDER BY id'
+
+STREAK_ROWS_SQL = '''
+    SELECT h.id, s.current_streak, s.longest_streak, s.last_completed_date
+    FROM habits h
+    LEFT JOIN habit_streaks s ON s.habit_id = h.id
+'''
+
+Streak = namedtuple('Streak', ['current', 'longest'])
+
+# Gamification points: every log earns a completion event, logs with a high
+# mood a bonus event; events count while they are within the points window.
+# Each day of a current streak adds STREAK_DAY_POINTS on top.
+POINTS_PER_COMPLETION = 10
+HIGH_MOOD_BONUS = 5
+HIGH_MOOD = 4
+STREAK_DAY_POINTS = 2
+POINTS_WINDOW_DAYS = 365
+
+# Point events of the logs matching {where}, in a deterministic order
+LEDGER_FROM_LOGS_SQL = f'''
+    INSERT INTO points_ledger (log_id, habit_id, event_date, kind, points)
+    SELECT log_id, habit_id, event_date, kind, points FROM (
+        SELECT id AS log_id, habit_id, completed_date AS event_date,
+               'completion' AS kind, {POINTS_PER_COMPLETION} AS points
+        FROM habit_logs WHERE {{where}}
+        UNION ALL
+        SELECT id, habit_id, completed_date, 'high_mood', {HIGH_MOOD_BONUS}
+        FROM habit_logs WHERE {{where}} AND mood_score >= {HIGH_MOOD}
+    )
+    ORDER BY log_id, kind
+'''
+
+# The whole points read: windowed event total plus today's streak bonus
+POINTS_SQL = '''
+    SELECT p.total, p.window_start,
+           (SELECT COALESCE(SUM(current_streak), 0) FROM habit_streaks
+            WHERE last_completed_date = :today)
+    FROM points_summary p
+    WHERE p.id = 1
+'''
+
+# The same for one user: their global points-board score plus the
+# current streaks of their habits
+USER_POINTS_SQL = '''
+    SELECT COALESCE((SELECT score FROM leaderboard
+                     WHERE board = 'points' AND category = '' AND user_id = :user_id), 0),
+           (SELECT COALESCE(SUM(s.current_streak), 0)
+            FROM habits h JOIN habit_streaks s ON s.habit_id = h.id
+            WHERE h.user_id = :user_id AND s.last_completed_date = :today)
+'''
+
+# Leaderboard rows (category, user_id, value) from the point events or
+# habit streaks matching {where}: one per user and habit category, plus
+# one per user for the global board (category '')
+LEADERBOARD_POINTS_SQL = '''
+    WITH events AS MATERIALIZED (
+        SELECT h.category, h.user_id, l.points AS value
+        FROM points_ledger l JOIN habits h ON h.id = l.habit_id
+        WHERE {where}
+    )
+    SELECT category, user_id, SUM(value) FROM (
+        SELECT category, user_id, value FROM events WHERE category IS NOT NULL
+        UNION ALL
+        SELECT '', user_id, value FROM events
+    )
+    GROUP BY category, user_id
+'''
+LEADERBOARD_STREAKS_SQL = '''
+    WITH events AS MATERIALIZED (
+        SELECT h.category, h.user_id, s.longest_streak AS value
+        FROM habit_streaks s JOIN habits h ON h.id = s.habit_id
+        {where}
+    )
+    SELECT category, user_id, MAX(value) FROM (
+        SELECT category, user_id, value FROM events WHERE category IS NOT NULL
+        UNION ALL
+        SELECT '', user_id, value FROM events
+    )
+    GROUP BY category, user_id
+'''
+# Events appended since :last_event that fall inside the points window
+NEW_POINT_EVENTS = ('l.id > :last_event AND l.event_date >= '
+                    '(SELECT window_start FROM points_summary WHERE id = 1)')
+
+LEADERBOARD_SCORE_SQL = 'SELECT score FROM leaderboard WHERE board = ? AND category = ? AND user_id = ?'
+
+# Leaderboard versions whose score changes stay in leaderboard_changes; a
+# Leaderboard further behind than this reloads the boards it reads
+SCORE_CHANGE_VERSIONS = 1000
+LEADERBOARD_CHANGES_SQL = '''
+    SELECT version, board, category, old_score, new_score
+    FROM leaderboard_changes
+    WHERE version > ? AND version <= ?
+    ORDER BY version, rowid
+'''
+
+# Best K of a board, straight off idx_leaderboard_rank
+LEADERBOARD_TOP_SQL = '''
+    SELECT l.user_id, u.name, l.score
+    FROM leaderboard l
+    LEFT JOIN users u ON u.id = l.user_id
+    WHERE l.board = ? AND l.category = ?
+    ORDER BY l.score DESC, l.user_id
+    LIMIT ?
+'''
+
+# Status of the latest job of a kind for one row
+JOB_STATUS_SQL = 'SELECT status FROM jobs WHERE kind = ? AND target_id = ? ORDER BY id DESC LIMIT 1'
+
+# Request-path queries that must be index-backed; checked with
+# `python migrations.py` and HabitDatabase.unindexed_queries().
+HOT_QUERIES = {
+    'get_habit_logs': (LOGS_SINCE_SQL, ('-30 days',)),
+    'get_daily_rollup': (ROLLUP_SINCE_SQL, ('-30 days',)),
+    # Every habit gets a row, so reading all of `habits` is intended
+    'completion_rates': (COMPLETIONS_SQL, ('2024-01-01', '2024-01-07'), {'h'}),
+    'backfill_sentiment': (
+        "SELECT id FROM habit_logs WHERE +id > ? AND notes_sentiment IS NULL"
+        " AND completed_date >= date('now', ?) ORDER BY +id LIMIT 1000",
+        (0, '-14 days')
+    ),
+    'get_current_streak': (STREAK_ROWS_SQL + ' WHERE h.id = ?', (1,)),
+    'rebuild_streaks': (STREAKS_SQL.format(where='WHERE habit_id = ?'), (1,)),
+    'window_totals': (WINDOW_TOTALS_SQL, {'midpoint': '2024-01-07', 'window': '-14 days'}),
+    'calculate_points': (POINTS_SQL, {'today': '2024-01-07'}),
+    'expire_points': (
+        'SELECT SUM(points) FROM points_ledger WHERE event_date >= ? AND event_date < ?',
+        ('2024-01-01', '2024-01-02')
+    ),
+    'analytics_snapshot': (SNAPSHOT_SQL, {'origin': '2024-01-01', 'habit_origin': '2024-12-01'}),
+    'user_points': (USER_POINTS_SQL, {'user_id': 1, 'today': '2024-01-07'}),
+    'leaderboard_points': (LEADERBOARD_POINTS_SQL.format(where=NEW_POINT_EVENTS), {'last_event': 0}),
+    'leaderboard_streaks': (LEADERBOARD_STREAKS_SQL.format(where='WHERE s.habit_id = :habit_id'),
+                            {'habit_id': 1}),
+    'leaderboard_score': (LEADERBOARD_SCORE_SQL, ('points', '', 1)),
+    'leaderboard_top': (LEADERBOARD_TOP_SQL, ('points', '', 10)),
+    'leaderboard_changes': (LEADERBOARD_CHANGES_SQL, (0, 1)),
+    'claim_job': ("SELECT id FROM jobs WHERE status = 'pending' ORDER BY id LIMIT 1", ()),
+    'job_status': (JOB_STATUS_SQL, ('journal_sentiment', 1)),
+}
+
+
+def rolling_rates(habits, daily, end, windows):
+    """Add `actual_<N>d` and `rate_<N>d` columns to `habits` for each window.
+    
+    `daily` holds habit_id, completed_date and completions rows covering the
+    widest window ending at `end`; they are scattered into a habit x
+    day-offset matrix and each window is read off a cumulative sum.
+    """
+    widest = max(windows)
+    row = pd.Index(habits['habit_id']).get_indexer(daily['habit_id'])
+    offset = (pd.Timestamp(end) - pd.to_datetime(daily['completed_date'])).dt.days.to_numpy()
+    # Logs dated after `end` (only possible without as_of) count in every window
+    offset = np.clip(offset, 0, widest)
+    keep = row >= 0
+    counts = np.zeros((len(habits), widest + 1))
+    np.add.at(counts, (row[keep], offset[keep]), daily['completions'].to_numpy()[keep])
+    cumulative = counts.cumsum(axis=1)
+
+    weekly_target = habits['target_frequency'].fillna(0).to_numpy(dtype=float)
+    for days in windows:
+        actual = cumulative[:, days]
+        target = weekly_target * days / 7
+        habits[f'actual_{days}d'] = actual.astype(int)
+        habits[f'rate_{days}d'] = np.divide(actual * 100, target,
+                                            out=np.zeros_like(actual), where=target > 0)
+    return habits
+
+
+def score_note(notes):
+    """Sentiment polarity of a log note, computed once when it is stored"""
+    # Imported lazily: the NLP stack is only needed when notes are written
+    from sentiment_analyzer import SentimentAnalyzer
+    return SentimentAnalyzer.analyze_text(notes)
+
+
+def ratio(total, count):
+    """Mean from a rollup sum and count; NaN when there is nothing to average"""
+    return float(total) / count if count else float('nan')
+
+
+class _ThreadToken:
+    """Held only by a thread's slot in the pool's threading.local"""
+
+
+class ConnectionPool:
+    """Hands out one long-lived, pre-configured SQLite connection per thread.
+    
+    A connection is closed when its thread exits (the thread's local slot,
+    and with it a token whose finalizer closes the connection, is dropped
+    then), so servers that start a thread per request do not leak one
+    connection per request. Connections are only ever used by the thread
+    that opened them; check_same_thread is off so that they can be closed
+    from another thread.
+    """
+    
+    def __init__(self, db_name, timeout=5.0):
+        self.db_name = db_name
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = set()
+    
+    def get(self):
+        """Return the calling thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_name, timeout=self.timeout, check_same_thread=False)
+            for pragma, value in CONNECTION_PRAGMAS:
+                conn.execute(f'PRAGMA {pragma} = {value}')
+            with self._lock:
+                self._connections.add(conn)
+            token = _ThreadToken()
+            weakref.finalize(token, self._release, conn)
+            self._local.conn = conn
+            self._local.token = token
+        return conn
+    
+    def _release(self, conn):
+        with self._lock:
+            self._connections.discard(conn)
+        conn.close()
+    
+    def __len__(self):
+        """Number of open connections"""
+        return len(self._connections)
+    
+    def close_all(self):
+        """Close every connection the pool has opened"""
+        with self._lock:
+            connections, self._connections = self._connections, set()
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
 class HabitDatabase:
-    def __init__(self, db_name='habit_tracker.db'):
+    # Derived data to rebuild after the migration that introduces it
+    BACKFILLS = {
+        3: 'rebuild_streaks',
+        4: 'rebuild_rollups',
+        7: 'rebuild_daily_totals',
+        8: 'rebuild_points',
+        9: 'rebuild_achievements',
+        10: 'rebuild_leaderboard',
+    }
+    # Migration 5 (notes_sentiment) is backfilled lazily by
+    # backfill_sentiment(), which the burnout predictor calls per window.
+    
+    def __init__(self, db_name='habit_tracker.db', cache_bytes=64 * 1024 * 1024):
         self.db_name = db_name
+        self.pool = ConnectionPool(db_name)
+        # Read cache for DataFrame queries; keys include the data generation
+        # so any write makes older entries unreachable (and LRU-evicted).
+        self.cache = LRUCache(max_entries=32, max_bytes=cache_bytes,
+                              sizeof=lambda entry: int(entry[1].memory_usage(deep=True).sum()))
+        self._tracing = threading.local()
+        # Called as listener(version, changes) after a write commits score
+        # changes; see leaderboard.Leaderboard
+        self.score_listeners = []
+        self._pending = threading.local()
         self.init_database()
     
-    def init_database(self):
-        """Initialize database with tables"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        # Create tables (use schema from Step 2)
-        cursor.executescript('''
-            CREATE TABLE IF NOT EXISTS habits (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                category TEXT,
-                target_frequency INTEGER,
-                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-            
-            CREATE TABLE IF NOT EXISTS habit_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                habit_id INTEGER,
-                completed_date DATE,
-                notes TEXT,
-                mood_score INTEGER,
-                energy_level INTEGER,
-                FOREIGN KEY (habit_id) REFERENCES habits(id)
-            );
-            
-            CREATE TABLE IF NOT EXISTS journal_entries (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                entry_date DATE,
-                content TEXT,
-                sentiment_score REAL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-        ''')
+    def connection(self):
+        """Pooled connection for the current thread"""
+        return self.pool.get()
+    
+    @contextmanager
+    def transaction(self):
+        """Cursor that commits on success and rolls back on error.
         
-        conn.commit()
-        conn.close()
+        The write lock is taken up front (BEGIN IMMEDIATE), so reads made
+        before the first write, such as MAX(id) in _insert_logs or the
+        streak row in _advance_streak, cannot be overtaken by another
+        process's write.
+        """
+        conn = self.connection()
+        self._pending.scores = None
+        changes = conn.total_changes
+        if not conn.in_transaction:
+            conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn.cursor()
+            if conn.total_changes != changes:
+                conn.execute('UPDATE revision SET version = version + 1 WHERE id = 1')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        self._publish_scores()
+    
+    @property
+    def generation(self):
+        """Changes whenever data may have changed, in this process or another.
+        
+        The count of committed transactions that changed rows, stored in the
+        `revision` table by transaction(). Every connection, thread and
+        process reads the same value (e.g. the Kivy app next to Dash), which
+        PRAGMA data_version, being per connection, does not give.
+        """
+        return self.connection().execute('SELECT version FROM revision WHERE id = 1').fetchone()[0]
+    
+    @contextmanager
+    def count_queries(self):
+        """Count the SQL statements this thread runs inside the block.
+        
+        Yields a Counter of statement keyword (SELECT, INSERT, PRAGMA, ...);
+        sum(counter.values()) is the total. Blocks may nest.
+        """
+        counts = Counter()
+        counters = getattr(self._tracing, 'counters', None)
+        if not counters:
+            # SQLite allows one trace callback per connection; it feeds every open block
+            counters = self._tracing.counters = []
+            self.connection().set_trace_callback(lambda sql: [
+                counter.update([sql.lstrip().split(None, 1)[0].upper()]) for counter in counters
+            ])
+        counters.append(counts)
+        try:
+            yield counts
+        finally:
+            counters.pop()      # blocks close innermost first
+            if not counters:
+                self.connection().set_trace_callback(None)
+    
+    def cache_stats(self):
+        """Hit/miss/eviction counters of the read cache"""
+        return self.cache.stats()
+    
+    def _cached_window(self, kind, sql, days, date_column):
+        """Serve an N-day window query, slicing the widest cached window.
+        
+        Windows are relative to SQLite's date('now') (UTC), so the day is part
+        of the key as well as the data generation.
+        """
+        today = datetime.now(timezone.utc).date()
+        key = (kind, self.generation, today)
+        days = int(days)
+        entry = self.cache.get(key)
+        if entry is None or entry[0] < days:
+            df = pd.read_sql_query(sql, self.connection(), params=(f'-{days} days',))
+            self.cache.put(key, (days, df))
+            return df.copy()
+        cached_days, df = entry
+        if cached_days == days:
+            return df.copy()
+        cutoff = (today - timedelta(days=days)).isoformat()
+        return df[df[date_column] >= cutoff].reset_index(drop=True)
+    
+    def close(self):
+        """Release all pooled connections"""
+        self.pool.close_all()
+    
+    def init_database(self):
+        """Create or upgrade the schema to the latest migration"""
+        applied = migrations.migrate(self.connection())
+        for version in applied:
+            if version in self.BACKFILLS:
+                getattr(self, self.BACKFILLS[version])()
+    
+    def unindexed_queries(self):
+        """Hot queries whose EXPLAIN QUERY PLAN shows a full table scan"""
+        return migrations.unindexed_queries(self.connection(), HOT_QUERIES)
+    
+    def add_user(self, name):
+        """Add a user; returns the new id"""
+        with self.transaction() as cursor:
+            cursor.execute('INSERT INTO users (name) VALUES (?)', (name,))
+            return cursor.lastrowid
     
-    def add_habit(self, name, category, target_frequency):
+    def add_habit(self, name, category, target_frequency, user_id=1):
         """Add a new habit"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute(
-            'INSERT INTO habits (name, category, target_frequency) VALUES (?, ?, ?)',
-            (name, category, target_frequency)
-        )
-        conn.commit()
-        conn.close()
+        with self.transaction() as cursor:
+            cursor.execute(
+                'INSERT INTO habits (name, category, target_frequency, user_id) VALUES (?, ?, ?, ?)',
+                (name, category, target_frequency, int(user_id))
+            )
+            return cursor.lastrowid
     
     def log_habit(self, habit_id, date, notes, mood_score, energy_level):
         """Log habit completion"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+        habit_id = int(habit_id)
+        sentiment = score_note(notes)
+        with self.transaction() as cursor:
+            in_order = self._advance_streak(cursor, habit_id, date)
+            cursor.execute(
+                '''INSERT INTO habit_logs 
+                   (habit_id, completed_date, notes, mood_score, energy_level, notes_sentiment) 
+                   VALUES (?, ?, ?, ?, ?, ?)''',
+                (habit_id, date, notes, mood_score, energy_level, sentiment)
+            )
+            self._record_points(cursor, 'id = ?', (cursor.lastrowid,))
+            params = {'date': date, 'habit_id': habit_id,
+                      'mood': mood_score, 'energy': energy_level, 'sentiment': sentiment}
+            cursor.execute(ROLLUP_UPSERT_SQL, params)
+            cursor.execute(DAILY_TOTALS_UPSERT_SQL, params)
+            if not in_order:
+                self._rebuild_streaks(cursor, [habit_id])
+            self._record_achievements(cursor, {
+                'total_logs': 1,
+                'mood_sum': mood_score or 0,
+                'mood_count': int(mood_score is not None),
+            }, habit_id)
+            self._record_best_streaks(cursor, habit_id)
+    
+    def log_habits_bulk(self, rows, chunk_size=5000):
+        """Insert many logs efficiently.
+        
+        `rows` is any iterable of (habit_id, date, notes, mood_score,
+        energy_level) tuples; it is consumed in chunks of `chunk_size`, each
+        written with executemany in its own transaction, so memory stays
+        bounded. Streaks of the touched habits are rebuilt once at the end.
+        Returns the number of rows inserted.
+        """
+        inserted = 0
+        touched = set()
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                inserted += self._insert_logs(chunk, touched)
+                chunk = []
+        if chunk:
+            inserted += self._insert_logs(chunk, touched)
+        if touched:
+            with self.transaction() as cursor:
+                self._rebuild_streaks(cursor, touched)
+                self._record_achievements(cursor, {})
+                self._record_best_streaks(cursor)
+        return inserted
+    
+    def _insert_logs(self, chunk, touched):
+        with self.transaction() as cursor:
+            last_id = cursor.execute('SELECT COALESCE(MAX(id), 0) FROM habit_logs').fetchone()[0]
+            cursor.executemany(
+                '''INSERT INTO habit_logs
+                   (habit_id, completed_date, notes, mood_score, energy_level)
+                   VALUES (?, ?, ?, ?, ?)''',
+                chunk
+            )
+            # Sentiment is left NULL here and scored by backfill_sentiment()
+            params = [
+                {'date': date, 'habit_id': habit_id, 'mood': mood, 'energy': energy,
+                 'sentiment': None}
+                for habit_id, date, _, mood, energy in chunk
+            ]
+            cursor.executemany(ROLLUP_UPSERT_SQL, params)
+            cursor.executemany(DAILY_TOTALS_UPSERT_SQL, params)
+            # The transaction holds the write lock, so the new logs are exactly id > last_id
+            self._record_points(cursor, 'id > ?', (last_id,))
+            moods = [row[3] for row in chunk if row[3] is not None]
+            # Streak rules are checked once the streaks are rebuilt
+            achievements.record(cursor, {
+                'total_logs': len(chunk),
+                'mood_sum': sum(moods),
+                'mood_count': len(moods),
+            })
+        touched.update(int(row[0]) for row in chunk)
+        return len(chunk)
+    
+    def _record_points(self, cursor, where, params):
+        """Append point events for the logs matching `where` and add the ones
+        inside the points window to the running total"""
+        last_event = cursor.execute(
+            'SELECT COALESCE(MAX(id), 0) FROM points_ledger').fetchone()[0]
+        cursor.execute(LEDGER_FROM_LOGS_SQL.format(where=where), params * 2)
         cursor.execute(
-            '''INSERT INTO habit_logs 
-               (habit_id, completed_date, notes, mood_score, energy_level) 
-               VALUES (?, ?, ?, ?, ?)''',
-            (habit_id, date, notes, mood_score, energy_level)
+            '''UPDATE points_summary SET total = total + (
+                   SELECT COALESCE(SUM(points), 0) FROM points_ledger
+                   WHERE id > ? AND event_date >= points_summary.window_start)
+               WHERE id = 1''',
+            (last_event,)
         )
-        conn.commit()
-        conn.close()
+        rows = cursor.execute(LEADERBOARD_POINTS_SQL.format(where=NEW_POINT_EVENTS),
+                              {'last_event': last_event}).fetchall()
+        self._update_leaderboard(cursor, 'points', rows, operator.add)
+    
+    def _record_best_streaks(self, cursor, habit_id=None):
+        """Raise streak-board scores to the longest streaks of one habit (or all)"""
+        if habit_id is None:
+            rows = cursor.execute(LEADERBOARD_STREAKS_SQL.format(where='')).fetchall()
+        else:
+            rows = cursor.execute(LEADERBOARD_STREAKS_SQL.format(where='WHERE s.habit_id = :habit_id'),
+                                  {'habit_id': habit_id}).fetchall()
+        self._update_leaderboard(cursor, 'streak', rows, max)
+    
+    def _update_leaderboard(self, cursor, board, rows, combine):
+        """Fold (category, user_id, value) rows into `board` as combine(score, value)"""
+        changes = []
+        for category, user_id, value in rows:
+            row = cursor.execute(LEADERBOARD_SCORE_SQL, (board, category, user_id)).fetchone()
+            old = row[0] if row else None
+            new = combine(old or 0, value)
+            if new != old:
+                cursor.execute(
+                    '''INSERT OR REPLACE INTO leaderboard (board, category, user_id, score)
+                       VALUES (?, ?, ?, ?)''',
+                    (board, category, user_id, new)
+                )
+                changes.append((board, category, user_id, old, new))
+        self._score_changes(cursor, changes)
+    
+    def _score_changes(self, cursor, changes):
+        """Queue leaderboard changes for the score listeners.
+        
+        `changes` are (board, category, user_id, old, new) tuples, or None
+        when the boards were rewritten wholesale. The stored version is
+        bumped once per transaction, and the changes are also logged under
+        it in leaderboard_changes for Leaderboards in other processes.
+        """
+        if changes == []:
+            return
+        pending = self._pending.scores
+        if pending is None:
+            version = cursor.execute(
+                'UPDATE leaderboard_version SET version = version + 1 WHERE id = 1 RETURNING version'
+            ).fetchone()[0]
+            pending = self._pending.scores = (version, [])
+            cursor.execute('DELETE FROM leaderboard_changes WHERE version <= ?',
+                           (version - SCORE_CHANGE_VERSIONS,))
+        if changes is None:
+            cursor.execute('INSERT INTO leaderboard_changes (version) VALUES (?)', (pending[0],))
+        else:
+            cursor.executemany(
+                'INSERT INTO leaderboard_changes (version, board, category, old_score, new_score) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [(pending[0], board, category, old, new)
+                 for board, category, _, old, new in changes])
+        if changes is None or pending[1] is None:
+            self._pending.scores = (pending[0], None)
+        else:
+            pending[1].extend(changes)
+    
+    def _publish_scores(self):
+        pending, self._pending.scores = self._pending.scores, None
+        if pending is not None:
+            for listener in self.score_listeners:
+                listener(*pending)
+    
+    def _record_achievements(self, cursor, added, habit_id=None):
+        """Add `added` to the achievement counters, raise the longest-streak
+        counter to the habit's (or every habit's) longest streak, and unlock
+        the rules this satisfies"""
+        if habit_id is None:
+            longest = cursor.execute('SELECT MAX(longest_streak) FROM habit_streaks').fetchone()[0]
+        else:
+            longest = cursor.execute(
+                'SELECT longest_streak FROM habit_streaks WHERE habit_id = ?', (habit_id,)
+            ).fetchone()[0]
+        return achievements.record(cursor, added, {'longest_streak': longest})
+    
+    def _advance_streak(self, cursor, habit_id, date):
+        """Update habit_streaks for a log on `date` before it is inserted.
+        
+        Returns False when the log is backdated onto a new day, which can
+        merge earlier runs, so the caller must rebuild the habit's streak.
+        """
+        day = datetime.strptime(str(date)[:10], '%Y-%m-%d').date()
+        row = cursor.execute(
+            '''SELECT current_streak, longest_streak, last_completed_date
+               FROM habit_streaks WHERE habit_id = ?''',
+            (habit_id,)
+        ).fetchone()
+        if row is None:
+            cursor.execute(
+                '''INSERT INTO habit_streaks
+                   (habit_id, current_streak, longest_streak, last_completed_date)
+                   VALUES (?, 1, 1, ?)''',
+                (habit_id, day.isoformat())
+            )
+            return True
+        
+        current, longest, last = row
+        gap = (day - datetime.strptime(last, '%Y-%m-%d').date()).days
+        if gap == 0:
+            return True
+        if gap < 0:
+            duplicate = cursor.execute(
+                'SELECT 1 FROM habit_logs WHERE habit_id = ? AND completed_date = ? LIMIT 1',
+                (habit_id, day.isoformat())
+            ).fetchone()
+            return duplicate is not None
+        
+        current = current + 1 if gap == 1 else 1
+        cursor.execute(
+            '''UPDATE habit_streaks
+               SET current_streak = ?, longest_streak = ?, last_completed_date = ?
+               WHERE habit_id = ?''',
+            (current, max(longest, current), day.isoformat(), habit_id)
+        )
+        return True
+    
+    def add_journal_entry(self, entry_date, content, sentiment_score=None):
+        """Save a journal entry.
+        
+        Without a sentiment score the entry is stored as pending and a
+        'journal_sentiment' job is queued in the same transaction for
+        jobs.JobQueue to score it. Returns the entry id.
+        """
+        with self.transaction() as cursor:
+            cursor.execute(
+                'INSERT INTO journal_entries (entry_date, content, sentiment_score) VALUES (?, ?, ?)',
+                (entry_date, content, sentiment_score)
+            )
+            entry_id = cursor.lastrowid
+            if sentiment_score is None:
+                self._enqueue_job(cursor, 'journal_sentiment', entry_id)
+            return entry_id
+    
+    def get_journal_entry(self, entry_id):
+        """The entry as a dict, or None.
+        
+        sentiment_score is None until the entry is scored; sentiment_status
+        is then 'done', and before that the status of its scoring job
+        ('pending', 'running' or 'failed'), or None when no job was queued.
+        """
+        conn = self.connection()
+        row = conn.execute(
+            'SELECT id, entry_date, content, sentiment_score FROM journal_entries WHERE id = ?',
+            (int(entry_id),)
+        ).fetchone()
+        if row is None:
+            return None
+        entry = dict(zip(('id', 'entry_date', 'content', 'sentiment_score'), row))
+        if entry['sentiment_score'] is not None:
+            entry['sentiment_status'] = 'done'
+        else:
+            job = conn.execute(JOB_STATUS_SQL, ('journal_sentiment', entry['id'])).fetchone()
+            entry['sentiment_status'] = job[0] if job else None
+        return entry
+    
+    def enqueue_job(self, kind, target_id):
+        """Queue background work for jobs.JobQueue; returns the job id"""
+        with self.transaction() as cursor:
+            return self._enqueue_job(cursor, kind, target_id)
+    
+    def _enqueue_job(self, cursor, kind, target_id):
+        cursor.execute('INSERT INTO jobs (kind, target_id, created_at) VALUES (?, ?, ?)',
+                       (kind, int(target_id), time.time()))
+        return cursor.lastrowid
     
     def get_habits(self):
         """Get all habits"""
-        conn = sqlite3.connect(self.db_name)
-        df = pd.read_sql_query('SELECT * FROM habits', conn)
-        conn.close()
-        return df
+        key = ('habits', self.generation)
+        entry = self.cache.get(key)
+        if entry is None:
+            entry = (None, pd.read_sql_query('SELECT * FROM habits', self.connection()))
+            self.cache.put(key, entry)
+        return entry[1].copy()
     
     def get_habit_logs(self, days=30):
         """Get habit logs for the last N days"""
-        conn = sqlite3.connect(self.db_name)
-        query = '''
-            SELECT hl.*, h.name, h.category 
-            FROM habit_logs hl
-            JOIN habits h ON hl.habit_id = h.id
-            WHERE hl.completed_date >= date('now', '-{} days')
-        '''.format(days)
-        df = pd.read_sql_query(query, conn)
-        conn.close()
-        return df
+        return self._cached_window('logs', LOGS_SINCE_SQL, days, 'completed_date')
     
-    def get_current_streak(self, habit_id):
-        """Calculate current streak for a habit"""
-        conn = sqlite3.connect(self.db_name)
-        logs = pd.read_sql_query(
-            f'''SELECT completed_date 
-                FROM habit_logs 
-                WHERE habit_id = {habit_id} 
-                ORDER BY completed_date DESC''',
-            conn
-        )
-        conn.close()
-        
-        if logs.empty:
-            return 0
+    def get_daily_rollup(self, days=30):
+        """Per (day, habit) completions and mood/energy sums for the last N days"""
+        return self._cached_window('rollup', ROLLUP_SINCE_SQL, days, 'completed_date')
+    
+    def backfill_sentiment(self, days=None, chunk_size=1000, workers=1):
+        """Score notes of logs that have no stored sentiment yet.
         
-        streak = 0
-        current_date = datetime.now().date()
+        Rows are walked in id order, scored with SentimentAnalyzer.analyze_batch
+        (`workers` > 1 uses a process pool) and written back `chunk_size` at a
+        time, each chunk updating logs and rollups in one transaction. `days`
+        limits the work to a recent window. Returns the number of rows scored.
+        """
+        where, params, key = 'notes_sentiment IS NULL', (), 'id'
+        if days is not None:
+            where += " AND completed_date >= date('now', ?)"
+            params = (f'-{int(days)} days',)
+            # '+id' stops SQLite walking the rowid from the first log; the
+            # partial unscored index finds the few rows in the window instead
+            key = '+id'
+        rows = self._walk('habit_logs', 'habit_id, completed_date, notes', where, params,
+                          chunk_size, key)
+        return self._score_rows(rows, self._store_note_scores, chunk_size, workers)
+    
+    def backfill_journal_sentiment(self, chunk_size=1000, workers=1):
+        """Score journal entries saved without a sentiment score"""
+        rows = self._walk('journal_entries', 'content', 'sentiment_score IS NULL', (),
+                          chunk_size)
+        return self._score_rows(rows, self._store_journal_scores, chunk_size, workers)
+    
+    def _walk(self, table, columns, where, params, chunk_size, key='id'):
+        """Yield (id, *columns) rows matching `where`, one keyset page at a time"""
+        conn = self.connection()
+        last_id = 0
+        while True:
+            page = conn.execute(
+                f'SELECT id, {columns} FROM {table} WHERE {key} > ? AND {where} ORDER BY {key} LIMIT ?',
+                (last_id, *params, chunk_size)
+            ).fetchall()
+            if not page:
+                return
+            yield from page
+            last_id = page[-1][0]
+    
+    def _score_rows(self, rows, store, chunk_size, workers):
+        """Score the last column of each row and hand (score, *row[:-1]) chunks to `store`"""
+        from sentiment_analyzer import SentimentAnalyzer
+        rows, texts = tee(rows)
+        scores = SentimentAnalyzer.analyze_batch((row[-1] for row in texts), workers=workers,
+                                                 batch_size=chunk_size)
+        scored = 0
+        pending = []
+        for row, score in zip(rows, scores):
+            pending.append((score, *row[:-1]))
+            if len(pending) >= chunk_size:
+                store(pending)
+                scored += len(pending)
+                pending = []
+        if pending:
+            store(pending)
+            scored += len(pending)
+        return scored
+    
+    def _store_journal_scores(self, scores):
+        """Write (score, entry_id) tuples"""
+        with self.transaction() as cursor:
+            cursor.executemany('UPDATE journal_entries SET sentiment_score = ? WHERE id = ?',
+                               scores)
+    
+    def _store_note_scores(self, scores):
+        """Write (score, log_id, habit_id, completed_date) tuples and fold them into rollups"""
+        with self.transaction() as cursor:
+            cursor.executemany(
+                'UPDATE habit_logs SET notes_sentiment = ? WHERE id = ?',
+                [(score, log_id) for score, log_id, _, _ in scores]
+            )
+            cursor.executemany(
+                '''UPDATE daily_habit_rollup
+                   SET sentiment_sum = sentiment_sum + ?, sentiment_count = sentiment_count + 1
+                   WHERE completed_date = ? AND habit_id = ?''',
+                [(score, day, habit_id) for score, _, habit_id, day in scores]
+            )
+            cursor.executemany(
+                '''UPDATE daily_totals
+                   SET sentiment_sum = sentiment_sum + ?, sentiment_count = sentiment_count + 1
+                   WHERE completed_date = ?''',
+                [(score, day) for score, _, _, day in scores]
+            )
+    
+    def rebuild_rollups(self):
+        """Recompute daily_habit_rollup from the full log history"""
+        with self.transaction() as cursor:
+            cursor.execute('DELETE FROM daily_habit_rollup')
+            cursor.execute('''
+                INSERT INTO daily_habit_rollup
+                    (completed_date, habit_id, completions, mood_sum, mood_count,
+                     energy_sum, energy_count, sentiment_sum, sentiment_count)
+                SELECT completed_date, habit_id, COUNT(*),
+                       COALESCE(SUM(mood_score), 0), COUNT(mood_score),
+                       COALESCE(SUM(energy_level), 0), COUNT(energy_level),
+                       COALESCE(SUM(notes_sentiment), 0), COUNT(notes_sentiment)
+                FROM habit_logs
+                GROUP BY completed_date, habit_id
+            ''')
+            self._rebuild_daily_totals(cursor)
+    
+    def rebuild_daily_totals(self):
+        """Recompute daily_totals from daily_habit_rollup"""
+        with self.transaction() as cursor:
+            self._rebuild_daily_totals(cursor)
+    
+    def _rebuild_daily_totals(self, cursor):
+        cursor.execute('DELETE FROM daily_totals')
+        cursor.execute('''
+            INSERT INTO daily_totals
+                (completed_date, completions, mood_sum, mood_count, energy_sum, energy_count,
+                 sentiment_sum, sentiment_count)
+            SELECT completed_date, SUM(completions), SUM(mood_sum), SUM(mood_count),
+                   SUM(energy_sum), SUM(energy_count), SUM(sentiment_sum), SUM(sentiment_count)
+            FROM daily_habit_rollup
+            GROUP BY completed_date
+        ''')
+    
+    def verify_daily_totals(self):
+        """Dates where daily_totals disagrees with daily_habit_rollup"""
+        conn = self.connection()
+        expected = pd.read_sql_query(
+            '''SELECT completed_date, SUM(completions) AS completions,
+                      SUM(mood_sum) AS mood_sum, SUM(mood_count) AS mood_count,
+                      SUM(energy_sum) AS energy_sum, SUM(energy_count) AS energy_count,
+                      SUM(sentiment_sum) AS sentiment_sum,
+                      SUM(sentiment_count) AS sentiment_count
+               FROM daily_habit_rollup GROUP BY completed_date''', conn
+        ).set_index('completed_date')
+        actual = pd.read_sql_query('SELECT * FROM daily_totals', conn).set_index('completed_date')
+        expected, actual = expected.align(actual, join='outer', fill_value=0)
+        # Sentiment sums are floats added up in a different order
+        same = np.isclose(expected.to_numpy(dtype=float), actual.to_numpy(dtype=float))
+        return list(expected.index[~same.all(axis=1)])
+    
+    def get_daily_totals(self, start, end):
+        """daily_totals rows for an inclusive date range (days without logs are absent)"""
+        return pd.read_sql_query(
+            'SELECT * FROM daily_totals WHERE completed_date BETWEEN ? AND ? ORDER BY completed_date',
+            self.connection(), params=(str(start), str(end))
+        )
+    
+    def get_journal_totals(self, start, end):
+        """Journal sentiment sum and count per entry date in an inclusive range"""
+        return pd.read_sql_query(
+            '''SELECT entry_date, COALESCE(SUM(sentiment_score), 0) AS sentiment_sum,
+                      COUNT(sentiment_score) AS sentiment_count
+               FROM journal_entries WHERE entry_date BETWEEN ? AND ?
+               GROUP BY entry_date ORDER BY entry_date''',
+            self.connection(), params=(str(start), str(end))
+        )
+    
+    def window_totals(self, days, midpoint):
+        """Sums and counts over the last `days` days, completions split at `midpoint`.
         
-        for _, row in logs.iterrows():
-            log_date = datetime.strptime(row['completed_date'], '%Y-%m-%d').date()
-            if (current_date - log_date).days == streak:
-                streak += 1
-            else:
-                break
+        Reads at most days + 1 rows of daily_totals, however many habits and
+        logs there are. The window matches get_daily_rollup(days).
+        """
+        cursor = self.connection().execute(
+            WINDOW_TOTALS_SQL, {'midpoint': midpoint, 'window': f'-{int(days)} days'}
+        )
+        return dict(zip([column[0] for column in cursor.description], cursor.fetchone()))
+    
+    def rebuild_points(self):
+        """Replay points_ledger and its summary from the full log history"""
+        window_start = self._points_window_start()
+        with self.transaction() as cursor:
+            cursor.execute('DELETE FROM points_ledger')
+            cursor.execute(LEDGER_FROM_LOGS_SQL.format(where='1'))
+            cursor.execute(
+                '''INSERT OR REPLACE INTO points_summary (id, total, window_start)
+                   SELECT 1, COALESCE(SUM(points), 0), ? FROM points_ledger
+                   WHERE event_date >= ?''',
+                (window_start, window_start)
+            )
+            self._rebuild_leaderboard(cursor)
+    
+    def rebuild_leaderboard(self):
+        """Recompute every leaderboard score from the points ledger and streaks"""
+        with self.transaction() as cursor:
+            self._rebuild_leaderboard(cursor)
+    
+    def _rebuild_leaderboard(self, cursor):
+        cursor.execute('DELETE FROM leaderboard')
+        for board, sql in (('points', LEADERBOARD_POINTS_SQL.format(
+                               where='l.event_date >= (SELECT window_start FROM points_summary)')),
+                           ('streak', LEADERBOARD_STREAKS_SQL.format(where=''))):
+            cursor.execute(
+                f'''INSERT INTO leaderboard (board, category, user_id, score)
+                    SELECT '{board}', * FROM ({sql})'''
+            )
+        self._score_changes(cursor, None)
+    
+    def _points_window_start(self):
+        """First day whose events still count, as in get_habit_logs(365)"""
+        today = datetime.now(timezone.utc).date()
+        return (today - timedelta(days=POINTS_WINDOW_DAYS)).isoformat()
+    
+    def get_points(self, user_id=None):
+        """Total points: windowed ledger events plus the current-streak bonus.
         
-        return streak
+        With `user_id`, only that user's habits count.
+        """
+        today = datetime.now().strftime('%Y-%m-%d')
+        row = self.connection().execute(POINTS_SQL, {'today': today}).fetchone()
+        if row is None:
+            self.rebuild_points()
+            return self.get_points(user_id)
+        total, window_start, streak_days = row
+        if self._roll_points_window(window_start):
+            return self.get_points(user_id)
+        if user_id is not None:
+            total, streak_days = self.connection().execute(
+                USER_POINTS_SQL, {'user_id': int(user_id), 'today': today}).fetchone()
+        return total + streak_days * STREAK_DAY_POINTS
+    
+    def expire_points(self):
+        """Move the points window up to today if it is behind; True if it moved"""
+        row = self.connection().execute(
+            'SELECT window_start FROM points_summary WHERE id = 1').fetchone()
+        if row is None:
+            self.rebuild_points()
+            return True
+        return self._roll_points_window(row[0])
+    
+    def _roll_points_window(self, window_start):
+        boundary = self._points_window_start()
+        if window_start >= boundary:
+            return False
+        # Once a day: events that just left the window stop counting
+        with self.transaction() as cursor:
+            cursor.execute(
+                '''UPDATE points_summary SET window_start = :boundary, total = total - (
+                       SELECT COALESCE(SUM(points), 0) FROM points_ledger
+                       WHERE event_date >= :start AND event_date < :boundary)
+                   WHERE id = 1 AND window_start = :start''',
+                {'boundary': boundary, 'start': window_start}
+            )
+            if cursor.rowcount:
+                expired = cursor.execute(
+                    LEADERBOARD_POINTS_SQL.format(
+                        where='l.event_date >= :start AND l.event_date < :boundary'),
+                    {'boundary': boundary, 'start': window_start}
+                ).fetchall()
+                self._update_leaderboard(cursor, 'points', expired, operator.sub)
+        return True
+    
+    def rebuild_achievements(self):
+        """Recount the achievement metrics from history and unlock what they
+        satisfy; existing unlocks keep their original timestamps"""
+        with self.transaction() as cursor:
+            cursor.execute('DELETE FROM achievement_metrics')
+            cursor.execute(
+                '''INSERT INTO achievement_metrics (name, value)
+                   SELECT 'total_logs', COUNT(*) FROM habit_logs
+                   UNION ALL SELECT 'mood_sum', COALESCE(SUM(mood_score), 0) FROM habit_logs
+                   UNION ALL SELECT 'mood_count', COUNT(mood_score) FROM habit_logs
+                   UNION ALL SELECT 'longest_streak', COALESCE(MAX(longest_streak), 0)
+                             FROM habit_streaks'''
+            )
+            return achievements.evaluate(cursor)
+    
+    def get_achievement_metrics(self):
+        """Current achievement counters as {name: value}"""
+        return dict(self.connection().execute('SELECT name, value FROM achievement_metrics'))
+    
+    def get_unlocked_achievements(self):
+        """{key: unlocked_at} for every unlocked achievement"""
+        return dict(self.connection().execute('SELECT key, unlocked_at FROM achievement_unlocks'))
+    
+    def get_current_streak(self, habit_id):
+        """Calculate current streak for a habit"""
+        return self._streaks(habit_id).get(int(habit_id), Streak(0, 0)).current
+    
+    def get_all_streaks(self):
+        """Current and longest streak for every habit as {habit_id: Streak}"""
+        return self._streaks()
+    
+    def _streaks(self, habit_id=None):
+        """Read habit_streaks; a streak is current only if its last day is today"""
+        today = datetime.now().strftime('%Y-%m-%d')
+        if habit_id is None:
+            rows = self.connection().execute(STREAK_ROWS_SQL)
+        else:
+            rows = self.connection().execute(STREAK_ROWS_SQL + ' WHERE h.id = ?',
+                                             (int(habit_id),))
+        return {
+            hid: Streak(current if last_date == today else 0, longest or 0)
+            for hid, current, longest, last_date in rows
+        }
+    
+    def rebuild_streaks(self, habit_ids=None):
+        """Recompute habit_streaks from the full log history"""
+        with self.transaction() as cursor:
+            self._rebuild_streaks(cursor, habit_ids)
+    
+    def _rebuild_streaks(self, cursor, habit_ids=None):
+        if habit_ids is None:
+            cursor.execute('DELETE FROM habit_streaks')
+            batches = [((), '')]
+        else:
+            ids = sorted({int(habit_id) for habit_id in habit_ids})
+            batches = []
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(ids), 500):
+                params = tuple(ids[start:start + 500])
+                marks = ', '.join('?' * len(params))
+                cursor.execute(f'DELETE FROM habit_streaks WHERE habit_id IN ({marks})', params)
+                batches.append((params, f'WHERE habit_id IN ({marks})'))
+        for params, where in batches:
+            cursor.execute(
+                f'''INSERT INTO habit_streaks
+                    (habit_id, current_streak, longest_streak, last_completed_date)
+                    SELECT habit_id, latest_length, longest_streak, last_completed_date
+                    FROM ({STREAKS_SQL.format(where=where)})''',
+                params
+            )
     
     def calculate_completion_rate(self, habit_id, days=7):
         """Calculate what % of target was achieved"""
-        habits = self.get_habits()
-        habit = habits[habits['id'] == habit_id]
+        rates = self.completion_rates(days=days)
+        habit = rates[rates['habit_id'] == habit_id]
         
         if habit.empty:
             return 0
         
-        target = habit.iloc[0]['target_frequency']
+        return float(habit.iloc[0]['rate'])
+    
+    def _window_bounds(self, days, as_of):
+        """Inclusive (start, end) dates for an N-day window ending at as_of.
+        
+        Like get_habit_logs, the window reaches back N days from today (UTC)
+        and has no upper bound unless as_of is given.
+        """
+        if as_of is None:
+            end, upper = datetime.now(timezone.utc).date(), '9999-12-31'
+        else:
+            end = pd.Timestamp(as_of).date()
+            upper = end.isoformat()
+        return end, (end - timedelta(days=int(days))).isoformat(), upper
+    
+    def completion_rates(self, days=7, as_of=None):
+        """Target vs actual completions for every habit in one grouped query.
         
-        logs = self.get_habit_logs(days=days)
-        actual = len(logs[logs['habit_id'] == habit_id])
+        target_frequency is per week, so the target is scaled to the window
+        length; `rate` is the percentage of that target achieved.
+        """
+        _, start, end = self._window_bounds(days, as_of)
+        rates = pd.read_sql_query(COMPLETIONS_SQL, self.connection(), params=(start, end))
+        rates['target'] = rates['target_frequency'].fillna(0) * int(days) / 7
+        rates['rate'] = (rates['actual'] / rates['target'].where(rates['target'] > 0) * 100).fillna(0)
+        return rates
+    
+    def rolling_completion_rates(self, windows=(7, 30, 90), as_of=None):
+        """Completion rate of every habit over several trailing windows at once.
         
-        return (actual / target * 100) if target > 0 else 0
+        Fetches the widest window once, scatters it into a habit x day-offset
+        matrix and reads each window off a cumulative sum. Adds
+        `actual_<N>d` and `rate_<N>d` columns per window.
+        """
+        widest = max(windows)
+        end, start, upper = self._window_bounds(widest, as_of)
+        habits = pd.read_sql_query(HABITS_SQL, self.connection())
+        daily = pd.read_sql_query(
+            '''SELECT habit_id, completed_date, completions FROM daily_habit_rollup
+               WHERE completed_date >= ? AND completed_date <= ?''',
+            self.connection(), params=(start, upper)
+        )
+        return rolling_rates(habits, daily, end, windows)
     
     def generate_weekly_report(self):
         """Generate summary of the past week"""
-        logs = self.get_habit_logs(days=7)
+        rollup = self.get_daily_rollup(days=7)
         
-        if logs.empty:
+        if rollup.empty:
             return None
         
+        per_habit = rollup.groupby('name')['completions'].sum()
+        # Same tie-break as Series.mode(): alphabetically first of the most frequent
+        most_completed = sorted(per_habit[per_habit == per_habit.max()].index)[0]
+        
         report = {
-            'total_completions': len(logs),
-            'avg_mood': round(logs['mood_score'].mean(), 1),
-            'avg_energy': round(logs['energy_level'].mean(), 1),
-            'most_completed': logs['name'].mode()[0] if len(logs) > 0 else 'None',
-            'unique_habits': logs['name'].nunique()
+            'total_completions': int(rollup['completions'].sum()),
+            'avg_mood': round(ratio(rollup['mood_sum'].sum(), rollup['mood_count'].sum()), 1),
+            'avg_energy': round(ratio(rollup['energy_sum'].sum(), rollup['energy_count'].sum()), 1),
+            'most_completed': most_completed,
+            'unique_habits': rollup['name'].nunique()
         }
         
         return report
     
-    def export_to_csv(self, filename='habit_data_export.csv'):
+    def iter_logs(self, start=None, end=None, habit_ids=None, categories=None,
+                  chunk_size=5000):
+        """Yield lists of EXPORT_COLUMNS tuples, paging through habit_logs by id.
+        
+        Keyset pagination keeps each page an indexed range read, so memory is
+        bounded by `chunk_size` however long the history is. `start`/`end`
+        are inclusive YYYY-MM-DD bounds.
+        """
+        filters, params = [], []
+        if start:
+            filters.append('hl.completed_date >= ?')
+            params.append(str(start))
+        if end:
+            filters.append('hl.completed_date <= ?')
+            params.append(str(end))
+        if habit_ids:
+            filters.append(f"hl.habit_id IN ({', '.join('?' * len(habit_ids))})")
+            params.extend(int(habit_id) for habit_id in habit_ids)
+        if categories:
+            filters.append(f"h.category IN ({', '.join('?' * len(categories))})")
+            params.extend(categories)
+        where = ''.join(f' AND {f}' for f in filters)
+        query = f'''
+            SELECT {', '.join(EXPORT_COLUMNS_SQL)}
+            FROM habit_logs hl
+            JOIN habits h ON hl.habit_id = h.id
+            WHERE hl.id > ?{where}
+            ORDER BY hl.id
+            LIMIT ?
+        '''
+        conn = self.connection()
+        last_id = 0
+        while True:
+            rows = conn.execute(query, [last_id, *params, chunk_size]).fetchall()
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1][0]
+    
+    def export_to_csv(self, filename='habit_data_export.csv', **filters):
         """Export all data to CSV"""
-        logs = self.get_habit_logs(days=365)
-        logs.to_csv(filename, index=False)
-        return filename
\ No newline at end of file
+        from exporter import export_logs
+        export_logs(self, filename, fmt='csv', **filters)
+        return filename
@@ -1,10 +1,15 @@
+-- Reference snapshot of the current schema.
+-- migrations.py is the source of truth: HabitDatabase applies it on startup
+-- and `python migrations.py [db]` upgrades a file in place.
+
 -- habits table
 CREATE TABLE habits (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     name TEXT NOT NULL,
     category TEXT,
     target_frequency INTEGER,
-    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    user_id INTEGER NOT NULL DEFAULT 1  -- migration 10
 );
 
 -- habit_logs table
@@ -15,6 +20,7 @@ CREATE TABLE habit_logs (
     notes TEXT,
     mood_score INTEGER,
     energy_level INTEGER,
+    notes_sentiment REAL,  -- migration 5
     FOREIGN KEY (habit_id) REFERENCES habits(id)
 );
 
@@ -25,4 +31,127 @@ CREATE TABLE journal_entries (
     content TEXT,
     sentiment_score REAL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
\ No newline at end of file
+);
+
+-- habit_streaks table (migration 3)
+CREATE TABLE habit_streaks (
+    habit_id INTEGER PRIMARY KEY REFERENCES habits(id),
+    current_streak INTEGER NOT NULL,
+    longest_streak INTEGER NOT NULL,
+    last_completed_date DATE NOT NULL
+);
+
+-- daily_habit_rollup table (migration 4)
+CREATE TABLE daily_habit_rollup (
+    completed_date DATE NOT NULL,
+    habit_id INTEGER NOT NULL REFERENCES habits(id),
+    completions INTEGER NOT NULL DEFAULT 0,
+    mood_sum INTEGER NOT NULL DEFAULT 0,
+    mood_count INTEGER NOT NULL DEFAULT 0,
+    energy_sum INTEGER NOT NULL DEFAULT 0,
+    energy_count INTEGER NOT NULL DEFAULT 0,
+    sentiment_sum REAL NOT NULL DEFAULT 0,      -- migration 5
+    sentiment_count INTEGER NOT NULL DEFAULT 0, -- migration 5
+    PRIMARY KEY (completed_date, habit_id)
+) WITHOUT ROWID;
+
+-- jobs table (migration 6)
+CREATE TABLE jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    target_id INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',    -- pending, running, done, failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,                  -- unix timestamps
+    started_at REAL,
+    finished_at REAL
+);
+
+-- daily_totals table (migration 7): daily_habit_rollup summed over habits
+CREATE TABLE daily_totals (
+    completed_date DATE PRIMARY KEY,
+    completions INTEGER NOT NULL DEFAULT 0,
+    mood_sum INTEGER NOT NULL DEFAULT 0,
+    mood_count INTEGER NOT NULL DEFAULT 0,
+    energy_sum INTEGER NOT NULL DEFAULT 0,
+    energy_count INTEGER NOT NULL DEFAULT 0,
+    sentiment_sum REAL NOT NULL DEFAULT 0,
+    sentiment_count INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+-- points_ledger and points_summary tables (migration 8)
+CREATE TABLE points_ledger (
+    id INTEGER PRIMARY KEY,
+    log_id INTEGER NOT NULL REFERENCES habit_logs(id),
+    habit_id INTEGER NOT NULL,
+    event_date DATE NOT NULL,
+    kind TEXT NOT NULL,                        -- completion, high_mood
+    points INTEGER NOT NULL
+);
+
+CREATE TABLE points_summary (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    total INTEGER NOT NULL,                    -- points of events on or after window_start
+    window_start DATE NOT NULL
+);
+
+-- achievement_metrics and achievement_unlocks tables (migration 9)
+CREATE TABLE achievement_metrics (
+    name TEXT PRIMARY KEY,                     -- total_logs, mood_sum, mood_count, longest_streak
+    value REAL NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE achievement_unlocks (
+    key TEXT PRIMARY KEY,                      -- achievements.ACHIEVEMENTS rule key
+    unlocked_at TIMESTAMP NOT NULL,
+    value REAL                                 -- metric value when unlocked
+) WITHOUT ROWID;
+
+-- users, leaderboard and leaderboard_version tables (migration 10)
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE leaderboard (
+    board TEXT NOT NULL,                       -- points, streak
+    category TEXT NOT NULL,                    -- habit category, '' for the global board
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    score INTEGER NOT NULL,
+    PRIMARY KEY (board, category, user_id)
+) WITHOUT ROWID;
+
+CREATE TABLE leaderboard_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+);
+
+-- leaderboard_changes table (migration 15)
+CREATE TABLE leaderboard_changes (
+    version INTEGER NOT NULL,
+    board TEXT,                                -- NULL when every board was rebuilt
+    category TEXT,
+    old_score INTEGER,
+    new_score INTEGER
+);
+
+-- revision table (migration 11)
+CREATE TABLE revision (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+);
+
+-- indexes (migration 2)
+CREATE INDEX idx_habit_logs_habit_date ON habit_logs (habit_id, completed_date);
+CREATE INDEX idx_habit_logs_date_habit ON habit_logs (completed_date, habit_id);
+CREATE INDEX idx_journal_entries_date ON journal_entries (entry_date);
+CREATE INDEX idx_habit_logs_unscored ON habit_logs (completed_date) WHERE notes_sentiment IS NULL;
+CREATE INDEX idx_jobs_status ON jobs (status, id);
+CREATE INDEX idx_points_ledger_date ON points_ledger (event_date, points);
+CREATE INDEX idx_habit_streaks_last ON habit_streaks (last_completed_date, current_streak);
+CREATE INDEX idx_habits_user ON habits (user_id);
+CREATE INDEX idx_leaderboard_rank ON leaderboard (board, category, score DESC, user_id);
+CREATE INDEX idx_jobs_target ON jobs (kind, target_id, id);
+CREATE INDEX idx_leaderboard_changes_version ON leaderboard_changes (version);
@@ -0,0 +1,116 @@
+"""Streaming export of habit logs.
+
+Pages through HabitDatabase.iter_logs and writes each chunk as it arrives,
+so memory stays flat regardless of history size. Output is plain CSV,
+gzip CSV, or a compressed columnar file (Parquet/Feather) when pyarrow is
+installed. The CSV layout is what importer.py reads back.
+"""
+import csv
+import gzip
+
+from database import EXPORT_COLUMNS
+
+FORMATS = ('csv', 'csv.gz', 'parquet', 'feather')
+
+
+def _has_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def guess_format(filename):
+    for fmt in ('csv.gz', 'parquet', 'feather', 'csv'):
+        if filename.endswith('.' + fmt):
+            return fmt
+    return 'csv'
+
+
+def _write_csv(chunks, opener, filename):
+    with opener(filename, 'wt', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_COLUMNS)
+        rows = 0
+        for chunk in chunks:
+            writer.writerows(chunk)
+            rows += len(chunk)
+    return rows
+
+
+def _arrow_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ('id', pa.int64()),
+        ('habit_id', pa.int64()),
+        ('completed_date', pa.string()),
+        ('notes', pa.string()),
+        ('mood_score', pa.int64()),
+        ('energy_level', pa.int64()),
+        ('name', pa.string()),
+        ('category', pa.string()),
+    ])
+
+
+def _to_batch(chunk, schema):
+    import pyarrow as pa
+    columns = list(zip(*chunk))
+    return pa.record_batch(
+        [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+        schema=schema
+    )
+
+
+def _write_parquet(chunks, filename):
+    import pyarrow.parquet as pq
+    schema = _arrow_schema()
+    rows = 0
+    with pq.ParquetWriter(filename, schema, compression='zstd') as writer:
+        for chunk in chunks:
+            writer.write_batch(_to_batch(chunk, schema))
+            rows += len(chunk)
+    return rows
+
+
+def _write_feather(chunks, filename):
+    # Feather v2 is the Arrow IPC file format, which can be written batch by batch
+    import pyarrow as pa
+    schema = _arrow_schema()
+    options = pa.ipc.IpcWriteOptions(compression='zstd')
+    rows = 0
+    with pa.OSFile(filename, 'wb') as sink:
+        with pa.ipc.new_file(sink, schema, options=options) as writer:
+            for chunk in chunks:
+                writer.write_batch(_to_batch(chunk, schema))
+                rows += len(chunk)
+    return rows
+
+
+def export_logs(db, filename, fmt=None, start=None, end=None, habit_ids=None,
+                categories=None, chunk_size=5000):
+    """Stream logs matching the filters to `filename`.
+
+    Returns (filename, rows_written). Columnar formats fall back to gzip CSV
+    when pyarrow is not installed; the returned filename reflects that.
+    """
+    fmt = fmt or guess_format(filename)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    if fmt in ('parquet', 'feather') and not _has_pyarrow():
+        print(f"pyarrow is not installed; writing gzip CSV instead of {fmt}")
+        if filename.endswith('.' + fmt):
+            filename = filename[:-len(fmt)] + 'csv.gz'
+        fmt = 'csv.gz'
+
+    chunks = db.iter_logs(start=start, end=end, habit_ids=habit_ids,
+                          categories=categories, chunk_size=chunk_size)
+    if fmt == 'csv':
+        rows = _write_csv(chunks, open, filename)
+    elif fmt == 'csv.gz':
+        rows = _write_csv(chunks, gzip.open, filename)
+    elif fmt == 'parquet':
+        rows = _write_parquet(chunks, filename)
+    else:
+        rows = _write_feather(chunks, filename)
+    return filename, rows
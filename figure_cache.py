@@ -0,0 +1,109 @@
+"""Server-side cache of serialized dashboard figures.
+
+Figures are keyed on (kind, window, data generation, today): the
+generation (see HabitDatabase.generation) moves with every committed
+write, in any process, and the
+date moves the rolling windows, so a cached figure is only served while
+the data it was drawn from is unchanged. Entries are Plotly JSON strings
+held in a bounded LRU; with a `path`, they are also written to a small
+SQLite file that every worker serving the dashboard can read, so a
+figure is built once per data change rather than once per process.
+"""
+import json
+import threading
+import time
+from datetime import datetime, timezone
+
+import plotly.io as pio
+
+from cache import LRUCache
+
+
+class FigureCache:
+    def __init__(self, database, max_entries=64, max_bytes=16 * 1024 * 1024, path=None):
+        self.db = database
+        self.memory = LRUCache(max_entries=max_entries, max_bytes=max_bytes, sizeof=len)
+        self.pool = None
+        self.disk_hits = 0
+        self.builds = 0
+        self.build_seconds = 0.0
+        self._lock = threading.Lock()
+        if path:
+            self.attach(path)
+
+    def attach(self, path):
+        """Share figures through `path`, a SQLite file of their own.
+
+        Not the habit database, so cache writes never wait on (or hold up)
+        the app's own writes for its lock.
+        """
+        from database import ConnectionPool
+        self.pool = ConnectionPool(path)
+        conn = self.pool.get()
+        conn.execute('''CREATE TABLE IF NOT EXISTS figure_cache (
+                            key TEXT PRIMARY KEY,
+                            revision INTEGER NOT NULL,
+                            day TEXT NOT NULL,
+                            figure TEXT NOT NULL
+                        ) WITHOUT ROWID''')
+        conn.commit()
+
+    def figure(self, kind, window, build, generation=None):
+        """The figure `build()` returns, as a dict dcc.Graph accepts.
+
+        `build` runs only on a miss, so anything it alone needs (e.g. a
+        series computed just for this chart) is skipped on a hit. Pass the
+        `generation` the figure's data was read at (e.g. an
+        AnalyticsSnapshot's) to save reading it once per figure.
+        """
+        if generation is None:
+            generation = self.db.generation
+        # Rollup windows end today in UTC, the burnout series in local time
+        day = f"{datetime.now(timezone.utc).date()}/{datetime.now().date()}"
+        key = f"{kind}:{window}:{generation}:{day}"
+        serialized = self.memory.get(key)
+        if serialized is None and self.pool is not None:
+            row = self.pool.get().execute(
+                'SELECT figure FROM figure_cache WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                serialized = row[0]
+                self.memory.put(key, serialized)
+                with self._lock:
+                    self.disk_hits += 1
+        if serialized is None:
+            start = time.perf_counter()
+            serialized = pio.to_json(build(), validate=False)
+            with self._lock:
+                self.builds += 1
+                self.build_seconds += time.perf_counter() - start
+            self.memory.put(key, serialized)
+            if self.pool is not None:
+                self._store(key, generation, day, serialized)
+        # A fresh dict per render, so nothing downstream can alter the cached figure
+        return json.loads(serialized)
+
+    def _store(self, key, generation, day, serialized):
+        conn = self.pool.get()
+        conn.execute('INSERT OR REPLACE INTO figure_cache (key, revision, day, figure) '
+                     'VALUES (?, ?, ?, ?)', (key, generation, day, serialized))
+        # Older generations and days can no longer be asked for
+        conn.execute('DELETE FROM figure_cache WHERE revision < ? OR day < ?', (generation, day))
+        conn.commit()
+
+    def clear(self):
+        self.memory.clear()
+        if self.pool is not None:
+            conn = self.pool.get()
+            conn.execute('DELETE FROM figure_cache')
+            conn.commit()
+
+    def stats(self):
+        """LRU counters plus disk hits, builds and the time spent building"""
+        stats = self.memory.stats()
+        stats['disk_hits'] = self.disk_hits
+        stats['builds'] = self.builds
+        stats['build_ms'] = round(self.build_seconds * 1000, 1)
+        if self.pool is not None:
+            stats['disk_entries'] = self.pool.get().execute(
+                'SELECT COUNT(*) FROM figure_cache').fetchone()[0]
+        return stats
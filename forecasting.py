@@ -0,0 +1,98 @@
+"""Short-horizon forecasts of mood, energy and completion volume.
+
+One daily_totals window is read per forecast. Every metric is fitted at
+once with NumPy: an exponentially weighted level (EWMA) and a least-squares
+linear trend, each projected over several horizons with a confidence band.
+Passing `now` forecasts as of an earlier day, which is what the backtest
+benchmark (``python benchmarks.py forecast-backtest``) uses.
+"""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+METRICS = ('mood', 'energy', 'completions')
+# Plausible range of each metric; forecasts and bands are clipped to it
+BOUNDS = {'mood': (1, 5), 'energy': (1, 5), 'completions': (0, np.inf)}
+
+
+class TrendForecaster:
+    def __init__(self, database, window=28, alpha=0.3, z=1.96):
+        self.db = database
+        self.window = window
+        self.alpha = alpha      # EWMA smoothing factor
+        self.z = z              # band half-width in standard errors (1.96 ~ 95%)
+
+    def daily_series(self, now=None):
+        """Mood/energy averages and completions per day for the `window` days up to `now`.
+
+        Days without logs have 0 completions and NaN mood/energy.
+        """
+        now = pd.Timestamp(now or datetime.now().date()).normalize()
+        first = now - pd.Timedelta(days=self.window - 1)
+        totals = self.db.get_daily_totals(first.date(), now.date())
+        totals = (totals.assign(completed_date=pd.to_datetime(totals['completed_date']))
+                        .set_index('completed_date')
+                        .reindex(pd.date_range(first, now, freq='D')))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return pd.DataFrame({
+                'mood': totals['mood_sum'] / totals['mood_count'].where(totals['mood_count'] > 0),
+                'energy': totals['energy_sum'] / totals['energy_count'].where(totals['energy_count'] > 0),
+                'completions': totals['completions'].fillna(0),
+            }, index=totals.index)
+
+    def forecast(self, now=None, horizons=(1, 7, 14)):
+        """Forecast every metric `horizons` days after `now`.
+
+        Returns a long DataFrame with columns metric, method ('ewma' or
+        'trend'), horizon, date, forecast, lower and upper. Metrics with
+        fewer than three observed days in the window get NaN forecasts.
+        """
+        series = self.daily_series(now)
+        y = series[list(METRICS)].to_numpy(dtype=float)       # days x metrics
+        observed = ~np.isnan(y)
+        w = observed.astype(float)
+        y0 = np.where(observed, y, 0.0)
+        x = np.arange(len(series), dtype=float)[:, None]
+        h = np.asarray(horizons, dtype=float)[:, None]       # horizons x 1
+        n = w.sum(axis=0)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # Weighted least squares per column, skipping unobserved days
+            x_mean = (w * x).sum(axis=0) / n
+            y_mean = (w * y0).sum(axis=0) / n
+            sxx = (w * (x - x_mean) ** 2).sum(axis=0)
+            slope = (w * (x - x_mean) * (y0 - y_mean)).sum(axis=0) / sxx
+            intercept = y_mean - slope * x_mean
+            residual = np.where(observed, y0 - (intercept + slope * x), 0.0)
+            sigma_trend = np.sqrt((residual ** 2).sum(axis=0) / (n - 2))
+            x_ahead = x[-1] + h
+            trend = intercept + slope * x_ahead
+            trend_se = sigma_trend * np.sqrt(1 + 1 / n + (x_ahead - x_mean) ** 2 / sxx)
+
+            # EWMA level, and the spread of its one-step-ahead errors
+            smoothed = series[list(METRICS)].ewm(alpha=self.alpha, ignore_na=True).mean()
+            errors = (series[list(METRICS)] - smoothed.shift(1)).to_numpy(dtype=float)
+            seen = ~np.isnan(errors)
+            sigma_ewma = np.sqrt((np.where(seen, errors, 0.0) ** 2).sum(axis=0) / seen.sum(axis=0))
+            level = np.broadcast_to(smoothed.to_numpy()[-1], trend.shape)
+            ewma_se = sigma_ewma * np.sqrt(1 + (h - 1) * self.alpha ** 2)
+
+        enough = n >= 3
+        dates = series.index[-1] + pd.to_timedelta(np.asarray(horizons), unit='D')
+        frames = []
+        for method, point, se in (('ewma', level, ewma_se), ('trend', trend, trend_se)):
+            point = np.where(enough, point, np.nan)
+            lower, upper = point - self.z * se, point + self.z * se
+            for j, metric in enumerate(METRICS):
+                low, high = BOUNDS[metric]
+                frames.append(pd.DataFrame({
+                    'metric': metric,
+                    'method': method,
+                    'horizon': list(horizons),
+                    'date': dates,
+                    'forecast': np.clip(point[:, j], low, high),
+                    'lower': np.clip(lower[:, j], low, high),
+                    'upper': np.clip(upper[:, j], low, high),
+                }))
+        return pd.concat(frames, ignore_index=True)
@@ -1,25 +1,36 @@
 from datetime import datetime, timedelta
 
+from achievements import ACHIEVEMENTS
+from database import (HIGH_MOOD, HIGH_MOOD_BONUS, POINTS_PER_COMPLETION, POINTS_WINDOW_DAYS,
+                      STREAK_DAY_POINTS)
+
 class Gamification:
-    def __init__(self, database):
+    def __init__(self, database, user_id=None):
         self.db = database
+        # None counts every user's habits
+        self.user_id = user_id
     
     def calculate_points(self):
-        """Calculate total points"""
-        logs = self.db.get_habit_logs(days=365)
+        """Calculate total points (kept current in the points ledger)"""
+        return self.db.get_points(self.user_id)
+    
+    def points_from_logs(self):
+        """Total points recomputed from the last year of logs.
+        
+        The reference the ledger is checked against by `manage.py replay-points`.
+        """
+        logs = self.db.get_habit_logs(days=POINTS_WINDOW_DAYS)
         
         points = 0
-        points += len(logs) * 10  # 10 points per completion
+        points += len(logs) * POINTS_PER_COMPLETION
         
         # Bonus for high mood
-        high_mood = len(logs[logs['mood_score'] >= 4])
-        points += high_mood * 5
+        high_mood = len(logs[logs['mood_score'] >= HIGH_MOOD])
+        points += high_mood * HIGH_MOOD_BONUS
         
         # Bonus for streaks
-        habits = self.db.get_habits()
-        for _, habit in habits.iterrows():
-            streak = self.db.get_current_streak(habit['id'])
-            points += streak * 2
+        streaks = self.db.get_all_streaks()
+        points += sum(streak.current for streak in streaks.values()) * STREAK_DAY_POINTS
         
         return points
     
@@ -41,42 +52,18 @@ class Gamification:
         return "Novice", "🌱", 0
     
     def check_achievements(self):
-        """Check which achievements user has earned"""
-        logs = self.db.get_habit_logs(days=365)
-        achievements = []
-        
-        # Total completions
-        total = len(logs)
-        if total >= 10:
-            achievements.append(("🎯", "First Steps", "Logged 10 activities"))
-        if total >= 50:
-            achievements.append(("⭐", "Committed", "Logged 50 activities"))
-        if total >= 100:
-            achievements.append(("🏆", "Century Club", "Logged 100 activities"))
-        if total >= 365:
-            achievements.append(("👑", "Year Warrior", "Logged 365 activities"))
-        
-        # Streaks
-        habits = self.db.get_habits()
-        max_streak = 0
-        for _, habit in habits.iterrows():
-            streak = self.db.get_current_streak(habit['id'])
-            max_streak = max(max_streak, streak)
-        
-        if max_streak >= 3:
-            achievements.append(("🔥", "On Fire", "3 day streak"))
-        if max_streak >= 7:
-            achievements.append(("💪", "Week Warrior", "7 day streak"))
-        if max_streak >= 30:
-            achievements.append(("💎", "Month Master", "30 day streak"))
-        
-        # Mood achievements
-        if not logs.empty:
-            avg_mood = logs['mood_score'].mean()
-            if avg_mood >= 4.5:
-                achievements.append(("😊", "Happy Soul", "Average mood 4.5+"))
+        """Achievements the user has earned, as (icon, title, description)"""
+        return [(rule.icon, rule.title, rule.description)
+                for rule, _ in self.unlocked_achievements()]
+    
+    def unlocked_achievements(self):
+        """(rule, unlocked_at) per unlocked achievement, in declaration order.
         
-        return achievements
+        Unlocks are recorded as logs arrive (see achievements.py), so this
+        only reads the stored list.
+        """
+        unlocked = self.db.get_unlocked_achievements()
+        return [(rule, unlocked[rule.key]) for rule in ACHIEVEMENTS if rule.key in unlocked]
     
     def get_motivational_quote(self):
         """Return a random motivational quote"""
@@ -0,0 +1,134 @@
+"""Streaming importer for habit logs.
+
+Reads the CSV written by HabitDatabase.export_to_csv or exporter.py (plain or
+gzip, or JSON Lines with the same keys) row by row, validates each record, resolves habit names to ids
+and hands the rows to HabitDatabase.log_habits_bulk in chunks, so memory use
+does not grow with the size of the file.
+"""
+import csv
+import gzip
+import json
+import time
+from datetime import datetime
+
+
+class ImportStats:
+    """Counters reported at the end of an import"""
+
+    def __init__(self):
+        self.read = 0
+        self.imported = 0
+        self.rejected = 0
+        self.habits_created = 0
+        self.errors = []        # first few (line, reason) pairs
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.imported / self.seconds if self.seconds else 0.0
+
+    def reject(self, line, reason, keep=20):
+        self.rejected += 1
+        if len(self.errors) < keep:
+            self.errors.append((line, reason))
+
+    def summary(self):
+        return (f"Imported {self.imported:,} of {self.read:,} rows "
+                f"({self.rejected:,} rejected, {self.habits_created} new habits) "
+                f"in {self.seconds:.2f}s - {self.rows_per_second:,.0f} rows/s")
+
+
+def read_records(path, fmt=None):
+    """Yield (line_number, dict) from a CSV or JSONL file, one at a time"""
+    plain = path[:-3] if path.endswith('.gz') else path
+    fmt = fmt or ('jsonl' if plain.endswith(('.jsonl', '.ndjson')) else 'csv')
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            # Line 1 is the header
+            for line, record in enumerate(csv.DictReader(f), start=2):
+                yield line, record
+        elif fmt == 'jsonl':
+            for line, text in enumerate(f, start=1):
+                if text.strip():
+                    try:
+                        yield line, json.loads(text)
+                    except json.JSONDecodeError:
+                        yield line, None
+        else:
+            raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def _score(value, field):
+    """Parse an optional 1-5 score; pandas writes integers with NaN as '3.0'"""
+    if value is None or value == '':
+        return None
+    score = int(float(value))
+    if not 1 <= score <= 5:
+        raise ValueError(f"{field} must be between 1 and 5")
+    return score
+
+
+class HabitImporter:
+    """Validates records and streams them into the database"""
+
+    def __init__(self, db, create_missing=True, default_frequency=7):
+        self.db = db
+        self.create_missing = create_missing
+        self.default_frequency = default_frequency
+        self.stats = ImportStats()
+        # name -> id, loaded once; the habits table is small
+        self.habit_ids = {}
+        for habit_id, name in db.connection().execute('SELECT id, name FROM habits ORDER BY id'):
+            self.habit_ids.setdefault(name, habit_id)
+
+    def resolve_habit(self, record):
+        name = (record.get('name') or '').strip()
+        if not name:
+            raise ValueError("missing habit name")
+        habit_id = self.habit_ids.get(name)
+        if habit_id is None:
+            if not self.create_missing:
+                raise ValueError(f"unknown habit '{name}'")
+            habit_id = self.db.add_habit(name, record.get('category') or None,
+                                         self.default_frequency)
+            self.habit_ids[name] = habit_id
+            self.stats.habits_created += 1
+        return habit_id
+
+    def validate(self, record):
+        """Turn one record into a log_habits_bulk row, or raise ValueError"""
+        # Stored zero-padded: streaks, rollups and windows compare dates as text
+        date = datetime.strptime(str(record.get('completed_date') or '')[:10],
+                                 '%Y-%m-%d').date().isoformat()
+        mood = _score(record.get('mood_score'), 'mood_score')
+        energy = _score(record.get('energy_level'), 'energy_level')
+        # Resolve last so invalid rows never create habits
+        habit_id = self.resolve_habit(record)
+        return (habit_id, date, record.get('notes') or '', mood, energy)
+
+    def rows(self, records):
+        for line, record in records:
+            self.stats.read += 1
+            if not isinstance(record, dict):
+                self.stats.reject(line, "not a JSON object")
+                continue
+            try:
+                yield self.validate(record)
+            except (ValueError, TypeError) as e:
+                self.stats.reject(line, str(e))
+
+    def import_file(self, path, fmt=None, chunk_size=5000):
+        start = time.perf_counter()
+        self.stats.imported = self.db.log_habits_bulk(
+            self.rows(read_records(path, fmt)), chunk_size=chunk_size
+        )
+        self.stats.seconds = time.perf_counter() - start
+        return self.stats
+
+
+def import_logs(db, path, fmt=None, chunk_size=5000, create_missing=True):
+    """Import a CSV/JSONL file of habit logs; returns ImportStats"""
+    return HabitImporter(db, create_missing=create_missing).import_file(
+        path, fmt=fmt, chunk_size=chunk_size
+    )
@@ -0,0 +1,143 @@
+"""Background job queue persisted in SQLite.
+
+Jobs are rows in the `jobs` table (migration 6), written by HabitDatabase in
+the same transaction as the data they refer to. A JobQueue worker thread
+claims them oldest first and runs the handler registered for their kind,
+so slow work such as journal sentiment scoring stays off the request path.
+Because the queue lives in the database, jobs left pending or running when
+a process exits are picked up again by the next JobQueue.start().
+"""
+import threading
+import time
+
+CLAIM_SQL = '''
+    UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1
+    WHERE id = (SELECT id FROM jobs WHERE status = 'pending' ORDER BY id LIMIT 1)
+    RETURNING id, kind, target_id, attempts
+'''
+
+
+def score_journal_entry(db, entry_id):
+    """Score a journal entry saved with a pending sentiment"""
+    from sentiment_analyzer import SentimentAnalyzer
+    entry = db.get_journal_entry(entry_id)
+    if entry is None:
+        return      # deleted before it was scored
+    db._store_journal_scores([(SentimentAnalyzer.analyze_text(entry['content']), entry_id)])
+
+
+# kind -> handler(db, target_id); handlers must be safe to run twice
+HANDLERS = {
+    'journal_sentiment': score_journal_entry,
+}
+
+
+class JobQueue:
+    """Single worker thread draining the jobs table"""
+
+    def __init__(self, db, handlers=None, max_attempts=3, poll_interval=2.0):
+        self.db = db
+        self.handlers = handlers or HANDLERS
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        # Counters for this process
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+
+    def start(self):
+        """Resume interrupted jobs and start the worker thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self.db.transaction() as cursor:
+            cursor.execute("UPDATE jobs SET status = 'pending' WHERE status = 'running'")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='job-queue', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def notify(self):
+        """Wake the worker now instead of at the next poll"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.run_next():
+                    continue
+            except Exception as e:
+                # Keep the worker alive through transient errors (e.g. a locked database)
+                print("Job queue error:", e)
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def run_next(self):
+        """Claim and run the oldest pending job; False when there is none"""
+        with self.db.transaction() as cursor:
+            job = cursor.execute(CLAIM_SQL, (time.time(),)).fetchone()
+        if job is None:
+            return False
+        job_id, kind, target_id, attempts = job
+        start = time.perf_counter()
+        try:
+            handler = self.handlers.get(kind)
+            if handler is None:
+                raise ValueError(f"no handler for job kind '{kind}'")
+            handler(self.db, target_id)
+        except Exception as e:
+            status = 'pending' if attempts < self.max_attempts else 'failed'
+            self._finish(job_id, status, f'{type(e).__name__}: {e}')
+            if status == 'failed':
+                self.failed += 1
+        else:
+            self._finish(job_id, 'done', None)
+            self.processed += 1
+        self.busy_seconds += time.perf_counter() - start
+        return True
+
+    def _finish(self, job_id, status, error):
+        with self.db.transaction() as cursor:
+            cursor.execute('UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?',
+                           (status, error, time.time(), job_id))
+
+    def drain(self, limit=None):
+        """Run pending jobs in the calling thread; returns how many ran"""
+        ran = 0
+        while (limit is None or ran < limit) and self.run_next():
+            ran += 1
+        return ran
+
+    def depth(self):
+        """Jobs waiting or in progress"""
+        return self.db.connection().execute(
+            "SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'running')"
+        ).fetchone()[0]
+
+    def stats(self, recent=100):
+        """Queue depth by status, throughput and latency of the last `recent` jobs"""
+        conn = self.db.connection()
+        counts = dict(conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status'))
+        latency = conn.execute(
+            '''SELECT AVG(finished_at - created_at) FROM (
+                   SELECT finished_at, created_at FROM jobs
+                   WHERE status = 'done' ORDER BY id DESC LIMIT ?)''',
+            (recent,)
+        ).fetchone()[0]
+        return {
+            'pending': counts.get('pending', 0),
+            'running': counts.get('running', 0),
+            'done': counts.get('done', 0),
+            'failed': counts.get('failed', 0),
+            'processed': self.processed,
+            'jobs_per_second': round(self.processed / self.busy_seconds, 1) if self.busy_seconds else 0.0,
+            'avg_latency_seconds': round(latency, 3) if latency is not None else None,
+        }
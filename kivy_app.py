@@ -7,6 +7,8 @@ from kivy.uix.textinput import TextInput
 from kivy.uix.spinner import Spinner
 from kivy.uix.slider import Slider
 from kivy.uix.scrollview import ScrollView
+from kivy.uix.progressbar import ProgressBar
+from kivy.clock import Clock
 from datetime import datetime
 import traceback
 
@@ -14,10 +16,14 @@ import traceback
 try:
     from database import HabitDatabase
     from burnout_predictor import BurnoutPredictor
-    from sentiment_analyzer import SentimentAnalyzer
+    from sentiment_analyzer import SentimentAnalyzer, cache_path_for
+    from jobs import JobQueue
     
     db = HabitDatabase()
+    SentimentAnalyzer.enable_disk_cache(cache_path_for(db.db_name))
     predictor = BurnoutPredictor(db)
+    jobs = JobQueue(db)
+    jobs.start()
     IMPORTS_OK = True
     IMPORT_ERROR = None
 except Exception as e:
@@ -44,9 +50,9 @@ class DashboardTab(BoxLayout):
             self.add_widget(Label(text='📊 Dashboard', font_size='24sp', size_hint_y=0.1))
             
             # Get data
-            logs = db.get_habit_logs(days=30)
+            rollup = db.get_daily_rollup(days=30)
             
-            if logs.empty:
+            if rollup.empty:
                 self.add_widget(Label(text='No data yet!\nAdd habits and log activities.'))
             else:
                 # Stats scroll view
@@ -56,7 +62,7 @@ class DashboardTab(BoxLayout):
                 getattr(stats_box, 'bind')(minimum_height=lambda x, y: setattr(stats_box, 'height', y))
                 
                 # Show habit counts
-                habit_counts = logs.groupby('name').size()
+                habit_counts = rollup.groupby('name')['completions'].sum()
                 for habit, count in habit_counts.items():
                     stats_box.add_widget(Label(
                         text=f'{habit}: {count} times',
@@ -65,25 +71,42 @@ class DashboardTab(BoxLayout):
                         color=(0, 0.5, 1, 1)
                     ))
                 
+                # Weekly goal progress for every habit
+                rates = db.completion_rates(days=7)
+                for name, actual, target, rate in zip(rates['name'], rates['actual'],
+                                                      rates['target'], rates['rate']):
+                    stats_box.add_widget(Label(
+                        text=f'{name}: {actual}/{target:g} this week ({rate:.0f}%)',
+                        size_hint_y=None,
+                        height=30
+                    ))
+                    stats_box.add_widget(ProgressBar(
+                        max=100,
+                        value=min(rate, 100),
+                        size_hint_y=None,
+                        height=20
+                    ))
+                
                 scroll.add_widget(stats_box)
                 self.add_widget(scroll)
                 self.add_widget(Label(text='🔥 Current Streaks:', font_size='20sp'))
             
                 habits = db.get_habits()
-                for _, habit in habits.iterrows():
-                    streak = db.get_current_streak(habit['id'])
+                streaks = db.get_all_streaks()
+                for habit_id, name in zip(habits['id'], habits['name']):
+                    streak = streaks[habit_id].current
                     if streak > 0:
                         self.add_widget(Label(
-                            text=f"{habit['name']}: {streak} days",
+                            text=f"{name}: {streak} days",
                             color=(1, 0.5, 0, 1) if streak >= 7 else (0.7, 0.7, 0.7, 1)
                         ))
-                        
-                        # Burnout score
-                        burnout_score, recommendation = predictor.calculate_burnout_score()
-                        self.add_widget(Label(
-                            text=f'🔥 Burnout Risk: {burnout_score}%\n{recommendation}',
-                            size_hint_y=0.2
-                        ))
+                
+                # Burnout score (once, not per habit)
+                burnout_score, recommendation = predictor.calculate_burnout_score()
+                self.add_widget(Label(
+                    text=f'🔥 Burnout Risk: {burnout_score}%\n{recommendation}',
+                    size_hint_y=0.2
+                ))
         except Exception as e:
             self.add_widget(Label(text=f'Error: {str(e)}', color=(1, 0, 0, 1)))
             print("Dashboard error:", e)
@@ -276,27 +299,34 @@ class JournalTab(BoxLayout):
                 self.status.color = (1, 0, 0, 1)
                 return
             
-            sentiment = SentimentAnalyzer.analyze_text(content)
-            sentiment_category = SentimentAnalyzer.get_sentiment_category(sentiment)
-            
-            import sqlite3
-            conn = sqlite3.connect(db.db_name)
-            cursor = conn.cursor()
+            # Save now; the job queue scores sentiment and check_sentiment picks it up
             date = datetime.now().strftime('%Y-%m-%d')
-            cursor.execute(
-                'INSERT INTO journal_entries (entry_date, content, sentiment_score) VALUES (?, ?, ?)',
-                (date, content, sentiment)
-            )
-            conn.commit()
-            conn.close()
+            entry_id = db.add_journal_entry(date, content)
+            jobs.notify()
             
-            self.status.text = f'✅ Saved! Sentiment: {sentiment_category}'
+            self.status.text = '✅ Saved! Analyzing sentiment...'
             self.status.color = (0, 1, 0, 1)
             self.journal_text.text = ''
+            Clock.schedule_interval(lambda dt: self.check_sentiment(entry_id), 0.5)
         except Exception as e:
             self.status.text = f'Error: {str(e)}'
             self.status.color = (1, 0, 0, 1)
             print("Journal error:", e)
+    
+    def check_sentiment(self, entry_id):
+        """Clock callback; returning False stops polling"""
+        entry = db.get_journal_entry(entry_id)
+        if entry is None:
+            return False
+        if entry['sentiment_status'] in ('pending', 'running'):
+            return True
+        if entry['sentiment_score'] is None:
+            # The job gave up (or none was queued)
+            self.status.text = '✅ Saved! Sentiment unavailable'
+            return False
+        sentiment_category = SentimentAnalyzer.get_sentiment_category(entry['sentiment_score'])
+        self.status.text = f'✅ Saved! Sentiment: {sentiment_category}'
+        return False
 
 
 class HabitTrackerApp(App):
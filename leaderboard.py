@@ -0,0 +1,177 @@
+"""Multi-user leaderboards.
+
+HabitDatabase keeps one `leaderboard` row per (board, category, user)
+current as logs arrive: the 'points' board holds each user's windowed
+ledger points and the 'streak' board their best streak, each globally
+(category '') and per habit category. Top-K reads walk the
+(board, category, score DESC) index, so they cost O(K log N). A user's
+rank is one primary-key lookup plus a count of higher scores from a
+Fenwick tree per board, kept in step with the committed score changes
+HabitDatabase publishes; O(log N) either way. Writes from other processes
+are read back from the leaderboard_changes log and applied the same way,
+at a cost per change rather than per user.
+"""
+import threading
+from datetime import date
+
+from database import LEADERBOARD_CHANGES_SQL, LEADERBOARD_SCORE_SQL, LEADERBOARD_TOP_SQL
+from gamification import Gamification
+
+BOARDS = ('points', 'streak')
+
+
+class RankIndex:
+    """Counts of non-negative integer scores with O(log n) "how many above" queries"""
+
+    def __init__(self, scores=()):
+        scores = list(scores)
+        self.counts = [0] * max(1024, max(scores, default=0) + 1)
+        for score in scores:
+            self.counts[score] += 1
+        self._build()
+
+    def _build(self):
+        # Fenwick tree (1-based) over self.counts, built in O(n)
+        self.tree = [0] + self.counts
+        for i in range(1, len(self.tree)):
+            parent = i + (i & -i)
+            if parent < len(self.tree):
+                self.tree[parent] += self.tree[i]
+        self.total = sum(self.counts)
+
+    def add(self, score, delta=1):
+        if score >= len(self.counts):
+            size = len(self.counts)
+            while size <= score:
+                size *= 2
+            self.counts.extend([0] * (size - len(self.counts)))
+            self._build()
+        self.counts[score] += delta
+        self.total += delta
+        i = score + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def count_above(self, score):
+        """Number of scores strictly greater than `score`"""
+        i = min(score + 1, len(self.counts))
+        at_most = 0
+        while i > 0:
+            at_most += self.tree[i]
+            i -= i & -i
+        return self.total - at_most
+
+
+class Leaderboard:
+    def __init__(self, database):
+        self.db = database
+        self.gamification = Gamification(database)
+        self._lock = threading.Lock()
+        self._indexes = {}
+        self._version = None
+        self._expired_on = None
+        database.score_listeners.append(self._apply)
+
+    def close(self):
+        """Stop following the database's score changes"""
+        if self._apply in self.db.score_listeners:
+            self.db.score_listeners.remove(self._apply)
+
+    def _apply(self, version, changes):
+        """Score listener: fold committed changes into the built indexes"""
+        with self._lock:
+            if self._version is None or version != self._version + 1:
+                # Already read back by _index, or an earlier version is still
+                # to come; _index catches up from leaderboard_changes
+                return
+            if changes is None:
+                self._indexes.clear()
+            else:
+                self._fold((board, category, old, new) for board, category, _, old, new in changes)
+            self._version = version
+
+    def _fold(self, changes):
+        for board, category, old, new in changes:
+            index = self._indexes.get((board, category))
+            if index is not None:
+                if old is not None:
+                    index.add(old, -1)
+                index.add(new)
+
+    def _catch_up(self, version):
+        """Apply the logged changes up to `version`, or drop the indexes
+        when the log no longer reaches back to ours"""
+        rows = []
+        if self._version is not None:
+            rows = self.db.connection().execute(
+                LEADERBOARD_CHANGES_SQL, (self._version, version)).fetchall()
+        # Every version logs at least one row, so a gap means pruned entries
+        complete = len({row[0] for row in rows}) == version - (self._version or 0)
+        if self._version is None or not complete or any(row[1] is None for row in rows):
+            self._indexes.clear()
+        else:
+            self._fold(row[1:] for row in rows)
+        self._version = version
+
+    def _expire(self):
+        """Drop expired points once a day before reading the points board"""
+        today = date.today()
+        if self._expired_on != today:
+            self.db.expire_points()
+            self._expired_on = today
+
+    def _stored_version(self):
+        return self.db.connection().execute(
+            'SELECT version FROM leaderboard_version').fetchone()[0]
+
+    def _index(self, board, category):
+        with self._lock:
+            while True:
+                version = self._stored_version()
+                if version != self._version:
+                    # Written by another process, or by this one with its
+                    # listener call still to come
+                    self._catch_up(version)
+                index = self._indexes.get((board, category))
+                if index is not None:
+                    return index
+                scores = [score for (score,) in self.db.connection().execute(
+                    'SELECT score FROM leaderboard WHERE board = ? AND category = ?',
+                    (board, category))]
+                # A write committed between the two reads may or may not be in
+                # `scores`; its listener call would then apply it twice, so
+                # only keep an index loaded at an unchanged version
+                if self._stored_version() == version:
+                    index = self._indexes[(board, category)] = RankIndex(scores)
+                    return index
+
+    def top(self, board='points', category='', k=10):
+        """Best `k` users as dicts with rank, user_id, name, score and level"""
+        if board == 'points':
+            self._expire()
+        rows = self.db.connection().execute(
+            LEADERBOARD_TOP_SQL, (board, category, int(k))).fetchall()
+        result = []
+        for position, (user_id, name, score) in enumerate(rows):
+            # Ties share a rank
+            rank = result[-1]['rank'] if result and result[-1]['score'] == score else position + 1
+            result.append({'rank': rank, 'user_id': user_id, 'name': name, 'score': score,
+                           'level': self._level(board, score)})
+        return result
+
+    def rank(self, user_id, board='points', category=''):
+        """(rank, score) of a user, or None when they have no score on the board"""
+        if board == 'points':
+            self._expire()
+        row = self.db.connection().execute(
+            LEADERBOARD_SCORE_SQL, (board, category, int(user_id))).fetchone()
+        if row is None:
+            return None
+        return self._index(board, category).count_above(row[0]) + 1, row[0]
+
+    def _level(self, board, score):
+        if board != 'points':
+            return None
+        title, icon, _ = self.gamification.get_level(score)
+        return f"{icon} {title}"
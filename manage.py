@@ -0,0 +1,278 @@
+"""Maintenance commands for a habit tracker database.
+
+Usage: python manage.py [--db habit_tracker.db] <command> [options]
+"""
+import argparse
+import os
+import sys
+import time
+
+from database import HabitDatabase
+
+
+def cmd_migrate(db, args):
+    """Upgrade the schema (done implicitly by opening the database)"""
+    import migrations
+    print(f"Schema version {migrations.get_version(db.connection())}")
+
+
+def cmd_rebuild_streaks(db, args):
+    """Recompute the materialized habit_streaks table from history"""
+    before = db.get_all_streaks()
+    start = time.perf_counter()
+    db.rebuild_streaks()
+    elapsed = time.perf_counter() - start
+    after = db.get_all_streaks()
+    drifted = [habit_id for habit_id in after if before.get(habit_id) != after[habit_id]]
+    print(f"Rebuilt streaks for {len(after)} habits in {elapsed:.2f}s"
+          f" ({len(drifted)} corrected)")
+
+
+def cmd_rebuild_rollups(db, args):
+    """Recompute the daily_habit_rollup table from history"""
+    start = time.perf_counter()
+    db.rebuild_rollups()
+    print(f"Rebuilt daily rollups in {time.perf_counter() - start:.2f}s")
+
+
+def cmd_backfill_sentiment(db, args):
+    """Score habit notes and journal entries that have no stored sentiment"""
+    for label, backfill in (('habit notes', db.backfill_sentiment),
+                            ('journal entries', db.backfill_journal_sentiment)):
+        start = time.perf_counter()
+        scored = backfill(chunk_size=args.chunk_size, workers=args.workers)
+        elapsed = time.perf_counter() - start
+        rate = scored / elapsed if elapsed else 0
+        print(f"Scored {scored:,} {label} in {elapsed:.2f}s ({rate:,.0f}/s)")
+
+
+def cmd_import(db, args):
+    """Stream habit logs from a CSV or JSONL file into the database"""
+    from importer import import_logs
+    stats = import_logs(db, args.path, fmt=args.format, chunk_size=args.chunk_size,
+                        create_missing=not args.no_create)
+    print(stats.summary())
+    for line, reason in stats.errors:
+        print(f"  line {line}: {reason}")
+    if args.no_sentiment:
+        return
+    # Imported notes are stored unscored; score them here rather than
+    # leaving it to the next dashboard render
+    start = time.perf_counter()
+    scored = db.backfill_sentiment(chunk_size=args.chunk_size, workers=args.workers)
+    print(f"Scored {scored:,} habit notes in {time.perf_counter() - start:.2f}s")
+
+
+def cmd_export(db, args):
+    """Stream habit logs to CSV, gzip CSV, Parquet or Feather"""
+    from exporter import export_logs
+    start = time.perf_counter()
+    filename, rows = export_logs(
+        db, args.path, fmt=args.format, start=args.start, end=args.end,
+        habit_ids=args.habit, categories=args.category, chunk_size=args.chunk_size
+    )
+    print(f"Exported {rows:,} rows to {filename} in {time.perf_counter() - start:.2f}s")
+
+
+def cmd_run_jobs(db, args):
+    """Run queued background jobs (e.g. journal sentiment) and report the queue"""
+    from jobs import JobQueue
+    queue = JobQueue(db)
+    start = time.perf_counter()
+    ran = queue.drain()
+    print(f"Ran {ran:,} jobs in {time.perf_counter() - start:.2f}s")
+    for key, value in queue.stats().items():
+        print(f"  {key}: {value}")
+
+
+def cmd_verify_burnout(db, args):
+    """Check daily_totals, burnout scores and burnout_series against the per-habit rollup"""
+    from datetime import datetime, timedelta
+    from burnout_predictor import BurnoutPredictor, score_totals, totals_from_rollup
+    drifted = db.verify_daily_totals()
+    print(f"daily_totals: {len(drifted)} days out of step with the rollup"
+          + (f" (first: {drifted[0]}; run rebuild-rollups)" if drifted else ""))
+    predictor = BurnoutPredictor(db)
+    mismatches = 0
+    for days in args.days:
+        start = time.perf_counter()
+        actual = predictor.calculate_burnout_score(days)
+        elapsed = time.perf_counter() - start
+        midpoint = (datetime.now() - timedelta(days=days//2)).strftime('%Y-%m-%d')
+        rollup = db.get_daily_rollup(days)
+        expected = ((0, "Insufficient data") if rollup.empty
+                    else score_totals(totals_from_rollup(rollup, midpoint)))
+        series = predictor.burnout_series(end=datetime.now().date(), window=days)
+        ok = actual == expected and series['score'].iloc[-1] == actual[0]
+        mismatches += not ok
+        print(f"  {days:>4} days: {actual[0]:>5} ({elapsed * 1000:.2f} ms)"
+              + ("" if ok else f"  MISMATCH, rollup gives {expected[0]},"
+                               f" burnout_series gives {series['score'].iloc[-1]}"))
+    if drifted or mismatches:
+        sys.exit(1)
+
+
+def cmd_train_burnout(db, args):
+    """Train the optional learned burnout model and compare it with the heuristic"""
+    from burnout_model import train
+    from burnout_predictor import BurnoutPredictor
+    try:
+        model, report = train(db, BurnoutPredictor(db, model_path=None), window=args.window,
+                              horizon=args.horizon, threshold=args.threshold, days=args.days)
+    except ValueError as e:
+        print(f"Cannot train: {e}")
+        sys.exit(1)
+    path = model.save(args.out)
+    print(f"Trained on {report['days']:,} days ({report['positive_rate']:.1%} reached "
+          f"{args.threshold:g} within {args.horizon} days) in {report['train_seconds'] * 1000:.1f} ms")
+    print(f"Saved {path} ({os.path.getsize(path):,} bytes); "
+          f"inference {report['inference_microseconds']:.1f} us per prediction")
+    print(f"Holdout Brier score {report['brier']:.4f} (base rate {report['brier_base_rate']:.4f})")
+    print(f"Holdout AUC: model {report['auc_model']:.3f}, "
+          f"today's heuristic score {report['auc_heuristic']:.3f}")
+    print("Calibration (holdout):")
+    print(report['calibration'].to_string(float_format=lambda v: f'{v:.3f}'))
+
+
+def cmd_replay_points(db, args):
+    """Rebuild the points ledger from history and check it against the formula"""
+    from gamification import Gamification
+    before = db.get_points()
+    start = time.perf_counter()
+    db.rebuild_points()
+    elapsed = time.perf_counter() - start
+    after = db.get_points()
+    expected = Gamification(db).points_from_logs()
+    events = db.connection().execute('SELECT COUNT(*) FROM points_ledger').fetchone()[0]
+    print(f"Replayed {events:,} point events in {elapsed:.2f}s")
+    print(f"  ledger before replay: {before:,}")
+    print(f"  ledger after replay:  {after:,}")
+    print(f"  formula over logs:    {expected:,}")
+    if after != expected or before != after:
+        print("MISMATCH")
+        sys.exit(1)
+
+
+
+def cmd_replay_achievements(db, args):
+    """Recount the achievement metrics from history and check the running counters"""
+    from achievements import RULES
+    before = db.get_achievement_metrics()
+    start = time.perf_counter()
+    newly = db.rebuild_achievements()
+    elapsed = time.perf_counter() - start
+    after = db.get_achievement_metrics()
+    print(f"Recounted achievement metrics in {elapsed:.2f}s")
+    mismatched = False
+    for name in sorted(after):
+        ok = abs(before.get(name, 0) - after[name]) < 1e-9
+        mismatched |= not ok
+        print(f"  {name}: running {before.get(name, 0):g}, recounted {after[name]:g}"
+              + ("" if ok else "  MISMATCH"))
+    for key, unlocked_at in sorted(db.get_unlocked_achievements().items(), key=lambda kv: kv[1]):
+        rule = RULES.get(key)
+        print(f"  {unlocked_at}  {rule.title if rule else key}"
+              + ("  (unlocked by replay)" if key in newly else ""))
+    if mismatched or newly:
+        sys.exit(1)
+
+
+def cmd_leaderboard(db, args):
+    """Show the top of a leaderboard, or one user's rank"""
+    from leaderboard import Leaderboard
+    board = Leaderboard(db)
+    label = f"{args.board} leaderboard" + (f" ({args.category})" if args.category else "")
+    if args.user is not None:
+        found = board.rank(args.user, args.board, args.category)
+        if found is None:
+            sys.exit(f"User {args.user} has no score on the {label}")
+        print(f"User {args.user}: rank {found[0]:,} on the {label} with {found[1]:,}")
+        return
+    print(label)
+    for row in board.top(args.board, args.category, args.top):
+        level = f"  {row['level']}" if row['level'] else ""
+        print(f"  {row['rank']:>4}. {row['name'] or row['user_id']:<24}{row['score']:>10,}{level}")
+
+
+COMMANDS = {
+    'migrate': cmd_migrate,
+    'rebuild-streaks': cmd_rebuild_streaks,
+    'rebuild-rollups': cmd_rebuild_rollups,
+    'backfill-sentiment': cmd_backfill_sentiment,
+    'import': cmd_import,
+    'export': cmd_export,
+    'run-jobs': cmd_run_jobs,
+    'verify-burnout': cmd_verify_burnout,
+    'train-burnout': cmd_train_burnout,
+    'replay-points': cmd_replay_points,
+    'replay-achievements': cmd_replay_achievements,
+    'leaderboard': cmd_leaderboard,
+}
+
+
+def add_arguments(name, parser):
+    if name == 'backfill-sentiment':
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=None,
+                            help='scoring processes (default: CPU count)')
+    elif name == 'import':
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--no-create', action='store_true',
+                            help='reject rows for habits that do not exist')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='processes for scoring note sentiment (default: CPU count)')
+        parser.add_argument('--no-sentiment', action='store_true',
+                            help='leave note sentiment unscored '
+                                 '(python manage.py backfill-sentiment scores it later)')
+    elif name == 'export':
+        from exporter import FORMATS
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='defaults to the file extension')
+        parser.add_argument('--start', help='first date (YYYY-MM-DD), inclusive')
+        parser.add_argument('--end', help='last date (YYYY-MM-DD), inclusive')
+        parser.add_argument('--habit', type=int, action='append', help='habit id (repeatable)')
+        parser.add_argument('--category', action='append', help='category (repeatable)')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+    elif name == 'verify-burnout':
+        parser.add_argument('--days', type=int, nargs='+', default=[7, 14, 30, 90],
+                            help='window lengths to check')
+    elif name == 'train-burnout':
+        from burnout_model import DEFAULT_MODEL_PATH
+        parser.add_argument('--out', default=DEFAULT_MODEL_PATH)
+        parser.add_argument('--window', type=int, default=14, help='feature window in days')
+        parser.add_argument('--horizon', type=int, default=7, help='days ahead to predict')
+        parser.add_argument('--threshold', type=float, default=40,
+                            help='heuristic score that counts as elevated risk')
+        parser.add_argument('--days', type=int, default=730, help='days of history to use')
+    elif name == 'leaderboard':
+        from leaderboard import BOARDS
+        parser.add_argument('--board', choices=BOARDS, default='points')
+        parser.add_argument('--category', default='', help='habit category (default: global)')
+        parser.add_argument('--top', type=int, default=10, help='number of users to show')
+        parser.add_argument('--user', type=int, help='show this user\'s rank instead')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default='habit_tracker.db', help='SQLite database file')
+    sub = parser.add_subparsers(dest='command', required=True)
+    for name, fn in COMMANDS.items():
+        add_arguments(name, sub.add_parser(name, help=fn.__doc__))
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    db = HabitDatabase(args.db)
+    try:
+        COMMANDS[args.command](db, args)
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,319 @@
+"""Versioned schema migrations keyed on ``PRAGMA user_version``.
+
+Each entry in MIGRATIONS upgrades the schema by exactly one version and is
+never edited once released; add a new entry instead. Existing databases
+created before migrations existed report user_version 0 and are upgraded
+in place (the version 1 DDL uses IF NOT EXISTS for that reason).
+"""
+import sqlite3
+import sys
+
+MIGRATIONS = [
+    (1, '''
+        CREATE TABLE IF NOT EXISTS habits (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            category TEXT,
+            target_frequency INTEGER,
+            created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TABLE IF NOT EXISTS habit_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            habit_id INTEGER,
+            completed_date DATE,
+            notes TEXT,
+            mood_score INTEGER,
+            energy_level INTEGER,
+            FOREIGN KEY (habit_id) REFERENCES habits(id)
+        );
+
+        CREATE TABLE IF NOT EXISTS journal_entries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            entry_date DATE,
+            content TEXT,
+            sentiment_score REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    '''),
+    (2, '''
+        -- Streak lookups: WHERE habit_id = ? ORDER BY completed_date
+        CREATE INDEX IF NOT EXISTS idx_habit_logs_habit_date
+            ON habit_logs (habit_id, completed_date);
+        -- Window scans: WHERE completed_date >= date('now', ...)
+        CREATE INDEX IF NOT EXISTS idx_habit_logs_date_habit
+            ON habit_logs (completed_date, habit_id);
+        CREATE INDEX IF NOT EXISTS idx_journal_entries_date
+            ON journal_entries (entry_date);
+    '''),
+    (3, '''
+        -- Materialized streaks, maintained by HabitDatabase.log_habit and
+        -- filled by HabitDatabase.rebuild_streaks()
+        CREATE TABLE IF NOT EXISTS habit_streaks (
+            habit_id INTEGER PRIMARY KEY REFERENCES habits(id),
+            current_streak INTEGER NOT NULL,
+            longest_streak INTEGER NOT NULL,
+            last_completed_date DATE NOT NULL
+        );
+    '''),
+    (4, '''
+        -- Per (day, habit) aggregates kept current on every write and
+        -- filled by HabitDatabase.rebuild_rollups()
+        CREATE TABLE IF NOT EXISTS daily_habit_rollup (
+            completed_date DATE NOT NULL,
+            habit_id INTEGER NOT NULL REFERENCES habits(id),
+            completions INTEGER NOT NULL DEFAULT 0,
+            mood_sum INTEGER NOT NULL DEFAULT 0,
+            mood_count INTEGER NOT NULL DEFAULT 0,
+            energy_sum INTEGER NOT NULL DEFAULT 0,
+            energy_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (completed_date, habit_id)
+        ) WITHOUT ROWID;
+    '''),
+    (5, '''
+        -- Note sentiment is scored once, at write time or by a backfill
+        ALTER TABLE habit_logs ADD COLUMN notes_sentiment REAL;
+        ALTER TABLE daily_habit_rollup ADD COLUMN sentiment_sum REAL NOT NULL DEFAULT 0;
+        ALTER TABLE daily_habit_rollup ADD COLUMN sentiment_count INTEGER NOT NULL DEFAULT 0;
+        -- Tiny partial index: only rows still waiting for a score
+        CREATE INDEX IF NOT EXISTS idx_habit_logs_unscored
+            ON habit_logs (completed_date) WHERE notes_sentiment IS NULL;
+    '''),
+    (6, '''
+        -- Background work drained by jobs.JobQueue; kept in the database so
+        -- jobs queued before a restart are still run afterwards
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            target_id INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL
+        );
+        -- Claiming the oldest pending job and counting the queue depth
+        CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id);
+    '''),
+    (7, '''
+        -- daily_habit_rollup summed over habits, so windowed scores such as
+        -- burnout read one row per day; filled by
+        -- HabitDatabase.rebuild_daily_totals()
+        CREATE TABLE IF NOT EXISTS daily_totals (
+            completed_date DATE PRIMARY KEY,
+            completions INTEGER NOT NULL DEFAULT 0,
+            mood_sum INTEGER NOT NULL DEFAULT 0,
+            mood_count INTEGER NOT NULL DEFAULT 0,
+            energy_sum INTEGER NOT NULL DEFAULT 0,
+            energy_count INTEGER NOT NULL DEFAULT 0,
+            sentiment_sum REAL NOT NULL DEFAULT 0,
+            sentiment_count INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID;
+    '''),
+    (8, '''
+        -- Point-earning events appended by HabitDatabase.log_habit and
+        -- replayed from habit_logs by HabitDatabase.rebuild_points()
+        CREATE TABLE IF NOT EXISTS points_ledger (
+            id INTEGER PRIMARY KEY,
+            log_id INTEGER NOT NULL REFERENCES habit_logs(id),
+            habit_id INTEGER NOT NULL,
+            event_date DATE NOT NULL,
+            kind TEXT NOT NULL,
+            points INTEGER NOT NULL
+        );
+        -- Expiring a day of events when the points window moves on
+        CREATE INDEX IF NOT EXISTS idx_points_ledger_date
+            ON points_ledger (event_date, points);
+        -- Single row: total of the events on or after window_start
+        CREATE TABLE IF NOT EXISTS points_summary (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total INTEGER NOT NULL,
+            window_start DATE NOT NULL
+        );
+        -- Today's streak bonus without reading every habit's streak
+        CREATE INDEX IF NOT EXISTS idx_habit_streaks_last
+            ON habit_streaks (last_completed_date, current_streak);
+    '''),
+    (9, '''
+        -- Running counters behind the achievement rules in achievements.py
+        CREATE TABLE IF NOT EXISTS achievement_metrics (
+            name TEXT PRIMARY KEY,
+            value REAL NOT NULL
+        ) WITHOUT ROWID;
+        -- One row per unlocked achievement; unlocks are never revoked
+        CREATE TABLE IF NOT EXISTS achievement_unlocks (
+            key TEXT PRIMARY KEY,
+            unlocked_at TIMESTAMP NOT NULL,
+            value REAL
+        ) WITHOUT ROWID;
+    '''),
+    (10, '''
+        -- Habits belong to a user; existing habits go to the default user 1
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        INSERT OR IGNORE INTO users (id, name) VALUES (1, 'default');
+        ALTER TABLE habits ADD COLUMN user_id INTEGER NOT NULL DEFAULT 1;
+        CREATE INDEX IF NOT EXISTS idx_habits_user ON habits (user_id);
+        -- Per-user scores: board 'points' or 'streak', category '' for the
+        -- global board; kept current by HabitDatabase.log_habit
+        CREATE TABLE IF NOT EXISTS leaderboard (
+            board TEXT NOT NULL,
+            category TEXT NOT NULL,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            score INTEGER NOT NULL,
+            PRIMARY KEY (board, category, user_id)
+        ) WITHOUT ROWID;
+        -- Top-K straight off the index
+        CREATE INDEX IF NOT EXISTS idx_leaderboard_rank
+            ON leaderboard (board, category, score DESC, user_id);
+        -- Bumped by every write that changes a score, so in-memory rank
+        -- indexes can tell whether they are current
+        CREATE TABLE IF NOT EXISTS leaderboard_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        );
+        INSERT OR IGNORE INTO leaderboard_version (id, version) VALUES (1, 0);
+    '''),
+    (11, '''
+        -- Bumped by every HabitDatabase transaction that changes rows; unlike
+        -- PRAGMA data_version it means the same thing to every process, so
+        -- caches shared between workers can be keyed on it
+        CREATE TABLE IF NOT EXISTS revision (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        );
+        INSERT OR IGNORE INTO revision (id, version) VALUES (1, 0);
+    '''),
+    (12, '''
+        -- The latest job for a row, e.g. whether a journal entry's sentiment
+        -- job is still pending or has failed
+        CREATE INDEX IF NOT EXISTS idx_jobs_target ON jobs (kind, target_id, id);
+    '''),
+    (13, '''
+        -- Happy Soul now needs 30 rated logs (achievements.MIN_MOOD_LOGS);
+        -- take back unlocks earned on fewer, which re-unlock once they qualify
+        DELETE FROM achievement_unlocks
+        WHERE key = 'happy_soul'
+          AND COALESCE((SELECT value FROM achievement_metrics WHERE name = 'mood_count'), 0) < 30;
+    '''),
+    (14, '''
+        -- Sentiment scores are cached in a file of their own
+        -- (sentiment_analyzer.cache_path_for); the table SentimentCache used
+        -- to create here also held lexicon scores filed under 'textblob'
+        DROP TABLE IF EXISTS sentiment_cache;
+    '''),
+    (15, '''
+        -- Score changes by leaderboard version, so a Leaderboard in another
+        -- process can apply a write instead of reloading whole boards
+        CREATE TABLE leaderboard_changes (
+            version INTEGER NOT NULL,
+            board TEXT,                                -- NULL when every board was rebuilt
+            category TEXT,
+            old_score INTEGER,
+            new_score INTEGER
+        );
+        CREATE INDEX idx_leaderboard_changes_version ON leaderboard_changes (version);
+    '''),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def get_version(conn):
+    """Schema version recorded in the database file"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def _statements(script):
+    """Split a migration script into single statements for Connection.execute"""
+    statement = ''
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement
+            statement = ''
+    if statement.strip():
+        # Trailing comments; anything else fails loudly in execute()
+        yield statement
+
+
+def migrate(conn, target=LATEST_VERSION):
+    """Apply pending migrations in order; returns the versions applied.
+    
+    The write lock is taken (BEGIN IMMEDIATE) before user_version is read
+    again, so when several processes open an old file at once, one applies
+    the migrations and the others wait for it, then find nothing to do.
+    """
+    if get_version(conn) >= target:
+        return []
+    if conn.in_transaction:
+        conn.commit()
+    # Statements run one by one: executescript() would commit, and so drop
+    # the lock, before running anything
+    conn.execute('BEGIN IMMEDIATE')
+    applied = []
+    try:
+        current = get_version(conn)
+        for version, script in MIGRATIONS:
+            if version <= current or version > target:
+                continue
+            for statement in _statements(script):
+                conn.execute(statement)
+            # Written in the same transaction, so a crash never leaves the
+            # schema and the recorded version out of step
+            conn.execute(f'PRAGMA user_version = {version}')
+            applied.append(version)
+        conn.commit()
+    except Exception:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    return applied
+
+
+def unindexed_queries(conn, queries):
+    """Return {name: plan} for every query that does an unexpected full table scan.
+    
+    `queries` maps names to (sql, params) or (sql, params, allowed), where
+    `allowed` names tables/aliases the query is meant to read in full.
+    """
+    problems = {}
+    for name, (sql, params, *allowed) in queries.items():
+        allowed = set(allowed[0]) if allowed else set()
+        plan = [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+        # CTEs and subqueries are scanned as temporary results, not tables
+        derived = {step.split(' ', 1)[1] for step in plan
+                   if step.startswith(('CO-ROUTINE ', 'MATERIALIZE '))}
+        # Index lookups show up as SEARCH; a bare SCAN walks the whole table.
+        for step in plan:
+            words = step.split(' ')
+            if (words[0] == 'SCAN' and len(words) == 2
+                    and words[1] not in derived | allowed and not words[1].startswith('(')):
+                problems[name] = plan
+                break
+    return problems
+
+
+if __name__ == '__main__':
+    import sqlite3
+    from database import HabitDatabase
+    db_name = sys.argv[1] if len(sys.argv) > 1 else 'habit_tracker.db'
+    conn = sqlite3.connect(db_name)
+    before = get_version(conn)
+    conn.close()
+    # Upgrade through HabitDatabase so the derived tables a migration
+    # introduces are backfilled (HabitDatabase.BACKFILLS); migrate() alone
+    # would leave them empty for good
+    db = HabitDatabase(db_name)
+    after = get_version(db.connection())
+    applied = [version for version, _ in MIGRATIONS if before < version <= after]
+    print(f"{db_name}: schema version {after}"
+          + (f" (applied {applied})" if applied else " (up to date)"))
+    problems = db.unindexed_queries()
+    for name, plan in problems.items():
+        print(f"  {name} is not indexed: {plan}")
+    db.close()
+    sys.exit(1 if problems else 0)
@@ -1,26 +1,343 @@
-from textblob import TextBlob
-import nltk
+import hashlib
+import logging
+import os
+import re
+import threading
+from functools import partial
+from itertools import islice
+
+from cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class BackendUnavailable(RuntimeError):
+    """A backend's dependencies are not installed"""
+
+
+class TextBlobBackend:
+    """TextBlob's pattern-based polarity (the reference scorer).
+
+    TextBlob and NLTK are imported on first use, once, and nothing is ever
+    downloaded: polarity only needs the lexicon bundled with TextBlob, so
+    missing NLTK corpora are just reported.
+    """
+    name = 'textblob'
+    CORPORA = ('tokenizers/punkt', 'corpora/brown')
+
+    def __init__(self):
+        self._blob = None
+        self._lock = threading.Lock()
+        self.missing_corpora = []
+
+    def load(self):
+        with self._lock:
+            if self._blob is not None:
+                return
+            try:
+                from textblob import TextBlob
+            except ImportError as e:
+                raise BackendUnavailable(f"textblob is not installed ({e})") from e
+            try:
+                import nltk
+                for resource in self.CORPORA:
+                    try:
+                        nltk.data.find(resource)
+                    except LookupError:
+                        self.missing_corpora.append(resource)
+            except ImportError:
+                self.missing_corpora = list(self.CORPORA)
+            if self.missing_corpora:
+                logger.info("NLTK corpora not found locally (%s); sentiment polarity "
+                            "does not need them", ', '.join(self.missing_corpora))
+            self._blob = TextBlob
+
+    def score(self, text):
+        if self._blob is None:
+            self.load()
+        # Returns polarity score between -1 (negative) and 1 (positive)
+        return self._blob(text).sentiment.polarity
+
+
+class LexiconBackend:
+    """Dependency-free lexicon scorer tuned for short habit notes.
+
+    Follows the same scheme as TextBlob's pattern analyzer so scores are
+    comparable: each opinion word contributes its polarity, scaled by a
+    preceding intensifier and multiplied by -0.5 after a negation, and the
+    text's score is the mean of those contributions.
+    """
+    name = 'lexicon'
+
+    LEXICON = {
+        # positive
+        'good': 0.7, 'great': 0.8, 'excellent': 1.0, 'perfect': 1.0, 'best': 1.0,
+        'wonderful': 1.0, 'awesome': 1.0, 'amazing': 0.6, 'fantastic': 0.4,
+        'nice': 0.6, 'fine': 0.4167, 'ok': 0.5, 'okay': 0.5, 'happy': 0.8,
+        'glad': 0.5, 'love': 0.5, 'loved': 0.7, 'lovely': 0.5, 'fun': 0.3,
+        'easy': 0.4333, 'strong': 0.4333, 'proud': 0.8, 'pleasant': 0.7333,
+        'satisfied': 0.5, 'excited': 0.375, 'calm': 0.3, 'better': 0.5,
+        'well': 0.5, 'enjoyed': 0.4, 'beautiful': 0.85, 'positive': 0.2273,
+        'fresh': 0.3, 'fast': 0.2, 'early': 0.1, 'busy': 0.1, 'success': 0.3,
+        'successful': 0.75, 'productive': 0.5, 'motivated': 0.5, 'energized': 0.5,
+        'refreshed': 0.5, 'relaxed': 0.4, 'grateful': 0.6, 'focused': 0.3,
+        'accomplished': 0.4, 'rested': 0.3, 'win': 0.8, 'healthy': 0.5,
+        'special': 0.3571, 'worth': 0.3, 'crushed': -0.1,
+        # negative
+        'bad': -0.7, 'terrible': -1.0, 'awful': -1.0, 'horrible': -1.0,
+        'worst': -1.0, 'worse': -0.4, 'poor': -0.4, 'sad': -0.5, 'tired': -0.4,
+        'exhausted': -0.4, 'lazy': -0.25, 'anxious': -0.25, 'angry': -0.5,
+        'weak': -0.375, 'sick': -0.7143, 'boring': -1.0, 'bored': -0.5,
+        'hard': -0.2917, 'difficult': -0.5, 'slow': -0.3, 'painful': -0.7,
+        'frustrated': -0.7, 'frustrating': -0.7, 'annoyed': -0.4, 'disappointed': -0.75,
+        'miserable': -1.0, 'hate': -0.8, 'rough': -0.1, 'tough': -0.3889,
+        'late': -0.3, 'stressed': -0.4, 'stressful': -0.4, 'upset': -0.5,
+        'sore': -0.3, 'distracted': -0.3, 'unmotivated': -0.5, 'lonely': -0.5,
+        'depressed': -0.6, 'overwhelmed': -0.5, 'drained': -0.4, 'failed': -0.5,
+        'missed': -0.2, 'skipped': -0.2, 'sleepy': -0.2, 'negative': -0.3,
+    }
+    INTENSIFIERS = {
+        'very': 1.3, 'really': 1.3, 'so': 1.3, 'extremely': 1.5, 'super': 1.3,
+        'incredibly': 1.5, 'totally': 1.3, 'quite': 1.1, 'pretty': 1.1,
+        'slightly': 0.5, 'somewhat': 0.7, 'bit': 0.7,
+    }
+    NEGATIONS = frozenset({
+        'not', 'no', 'never', "n't", 'nothing', 'hardly', 'barely', 'without',
+        "isn't", "wasn't", "don't", "didn't", "doesn't", "can't", "couldn't",
+        "won't", "wouldn't", "aren't", "weren't", 'nor', 'cannot',
+    })
+    # One compiled pass over the text does all tokenization in C
+    TOKEN_RE = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+    def score(self, text):
+        tokens = self.TOKEN_RE.findall(text.lower())
+        lexicon, intensifiers, negations = self.LEXICON, self.INTENSIFIERS, self.NEGATIONS
+        contributions = []
+        for i, token in enumerate(tokens):
+            polarity = lexicon.get(token)
+            if polarity is None:
+                continue
+            # Look back over at most three words: "not very good"
+            window = tokens[max(0, i - 3):i]
+            if window and window[-1] in intensifiers:
+                polarity *= intensifiers[window[-1]]
+            if any(word in negations for word in window):
+                polarity *= -0.5
+            contributions.append(polarity)
+        if not contributions:
+            return 0.0
+        return max(-1.0, min(1.0, sum(contributions) / len(contributions)))
+
+
+BACKENDS = {
+    TextBlobBackend.name: TextBlobBackend,
+    LexiconBackend.name: LexiconBackend,
+}
+
+# Selected with the HABIT_SENTIMENT_BACKEND environment variable or
+# SentimentAnalyzer.use_backend()
+DEFAULT_BACKEND = os.environ.get('HABIT_SENTIMENT_BACKEND', TextBlobBackend.name)
+_backends = {}
+
+
+def get_backend(name=None):
+    """Backend instance by name (default: the active backend).
+
+    Backends are created and loaded once. One whose dependencies are missing
+    degrades to the built-in lexicon scorer instead of failing.
+    """
+    name = name or SentimentAnalyzer.backend
+    backend = _backends.get(name)
+    if backend is None:
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown sentiment backend '{name}'. "
+                             f"Choose from: {', '.join(BACKENDS)}")
+        backend = BACKENDS[name]()
+        try:
+            if hasattr(backend, 'load'):
+                backend.load()
+        except BackendUnavailable as e:
+            logger.warning("Sentiment backend '%s' unavailable, using '%s': %s",
+                           name, LexiconBackend.name, e)
+            backend = get_backend(LexiconBackend.name)
+        _backends[name] = backend
+    return backend
+
+
+def _score_with(backend_name, text):
+    # Module-level so process-pool workers can unpickle it and score with
+    # the parent's backend regardless of their own environment
+    return get_backend(backend_name).score(text)
+
+
+class SentimentCache:
+    """Scores keyed by a hash of (backend, text), bounded in memory.
+
+    With a `path`, scores are also written to a `sentiment_cache` table in
+    that SQLite file so they survive restarts; memory misses fall through
+    to it before anything is re-scored. The file is the cache's own (see
+    cache_path_for), not the habit database, whose schema belongs to
+    migrations.py and whose write lock the app's writes need.
+    """
+
+    def __init__(self, max_entries=20000, path=None):
+        self.memory = LRUCache(max_entries=max_entries)
+        self.pool = None
+        self.disk_hits = 0
+        if path:
+            self.attach(path)
+
+    @staticmethod
+    def key(text, backend):
+        return hashlib.blake2b(f'{backend}\0{text}'.encode('utf-8'), digest_size=16).digest()
+
+    def attach(self, path):
+        """Persist scores in the SQLite file `path`"""
+        from database import ConnectionPool
+        self.pool = ConnectionPool(path)
+        conn = self.pool.get()
+        conn.execute('''CREATE TABLE IF NOT EXISTS sentiment_cache (
+                            hash BLOB PRIMARY KEY,
+                            score REAL NOT NULL
+                        ) WITHOUT ROWID''')
+        conn.commit()
+
+    def get_many(self, keys):
+        """{key: score} for every key found in memory or on disk"""
+        found = {}
+        missing = []
+        for key in keys:
+            score = self.memory.get(key)
+            if score is None:
+                missing.append(key)
+            else:
+                found[key] = score
+        if missing and self.pool is not None:
+            conn = self.pool.get()
+            # Chunked to stay under SQLite's bound-parameter limit
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT hash, score FROM sentiment_cache WHERE hash IN ({', '.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                for key, score in rows:
+                    self.memory.put(key, score)
+                    found[key] = score
+                self.disk_hits += len(rows)
+        return found
+
+    def put_many(self, items):
+        """Store (key, score) pairs in memory and, if attached, on disk"""
+        items = list(items)
+        for key, score in items:
+            self.memory.put(key, score)
+        if items and self.pool is not None:
+            conn = self.pool.get()
+            conn.executemany('INSERT OR REPLACE INTO sentiment_cache (hash, score) VALUES (?, ?)',
+                             items)
+            conn.commit()
+
+    def stats(self):
+        stats = self.memory.stats()
+        stats['disk_hits'] = self.disk_hits
+        if self.pool is not None:
+            stats['disk_entries'] = self.pool.get().execute(
+                'SELECT COUNT(*) FROM sentiment_cache').fetchone()[0]
+        return stats
+
+
+def cache_path_for(db_name):
+    """The sentiment cache file kept next to a habit database"""
+    return f'{os.path.splitext(db_name)[0]}.sentiment-cache.db'
 
-# Download required NLTK data (run once)
-try:
-    nltk.download('punkt', quiet=True)
-    nltk.download('brown', quiet=True)
-except:
-    pass
 
 class SentimentAnalyzer:
+    backend = DEFAULT_BACKEND
+    cache = SentimentCache()
+
+    @classmethod
+    def enable_disk_cache(cls, path):
+        """Keep scores in the SQLite file `path` so they survive restarts"""
+        cls.cache.attach(path)
+
+    @classmethod
+    def cache_stats(cls):
+        """Hit rate, entry count and evictions of the sentiment cache"""
+        return cls.cache.stats()
+
+    @classmethod
+    def use_backend(cls, name):
+        """Switch the backend used by analyze_text/analyze_batch"""
+        get_backend(name)
+        cls.backend = name
+
+    @staticmethod
+    def register_backend(backend_class):
+        """Make a backend (an object with `name` and `score(text)`) selectable"""
+        BACKENDS[backend_class.name] = backend_class
+
     @staticmethod
-    def analyze_text(text):
-        """Analyze sentiment of text using TextBlob"""
+    def analyze_text(text, backend=None):
+        """Analyze sentiment of text, -1 (negative) to 1 (positive)"""
         if not text or text.strip() == '':
             return 0.0
-        
-        blob = TextBlob(text)
-        # Returns polarity score between -1 (negative) and 1 (positive)
-        return blob.sentiment.polarity
-        # If you get an error, try calling sentiment as a method:
-        # return blob.sentiment().polarity
-    
+
+        # Keyed on the backend that scores, which is the lexicon when the
+        # requested one is unavailable
+        scorer = get_backend(backend)
+        cache = SentimentAnalyzer.cache
+        key = cache.key(text, scorer.name)
+        score = cache.get_many([key]).get(key)
+        if score is None:
+            score = scorer.score(text)
+            cache.put_many([(key, score)])
+        return score
+
+    @staticmethod
+    def analyze_batch(texts, workers=None, chunksize=64, batch_size=5000, backend=None):
+        """Score many texts, yielding polarities in input order.
+
+        `texts` may be any iterable (e.g. a generator over a table); it is
+        consumed `batch_size` items at a time, identical texts within a batch
+        are scored once, cached scores are reused, and the remaining texts
+        are fanned out over a process pool of `workers` (default: CPU count;
+        1 scores in-process).
+        """
+        # The backend that actually scores (see analyze_text); workers use it too
+        backend = get_backend(backend).name
+        score = partial(_score_with, backend)
+        cache = SentimentAnalyzer.cache
+        workers = workers or os.cpu_count() or 1
+        executor = None
+        if workers > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            texts = iter(texts)
+            while True:
+                batch = list(islice(texts, batch_size))
+                if not batch:
+                    return
+                unique = list(dict.fromkeys(
+                    text for text in batch if isinstance(text, str) and text.strip()
+                ))
+                keys = {text: cache.key(text, backend) for text in unique}
+                cached = cache.get_many(keys.values())
+                todo = [text for text in unique if keys[text] not in cached]
+                if executor is None:
+                    scores = list(map(score, todo))
+                else:
+                    scores = list(executor.map(score, todo, chunksize=chunksize))
+                cache.put_many((keys[text], s) for text, s in zip(todo, scores))
+                by_text = {text: cached[key] for text, key in keys.items() if key in cached}
+                by_text.update(zip(todo, scores))
+                for text in batch:
+                    yield by_text.get(text, 0.0) if isinstance(text, str) else 0.0
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
     @staticmethod
     def get_sentiment_category(score):
         """Convert sentiment score to category"""
@@ -29,4 +346,4 @@ class SentimentAnalyzer:
         elif score < -0.3:
             return 'Negative'
         else:
-            return 'Neutral'
\ No newline at end of file
+            return 'Neutral'